@@ -7,12 +7,37 @@ Version 3.0 - Con ranking dinamico por grupos SISBEN + analisis de brechas
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+try:
+    # API interna de Streamlit para enviar figuras ya serializadas (ver mostrar_figura)
+    from streamlit.elements.lib.layout_utils import LayoutConfig
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:
+    PlotlyChartProto = None
 import pandas as pd
-import geopandas as gpd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import numpy as np
+import shapely
+from scipy import sparse
+import base64
+import csv
+import io
+import itertools
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import asignacion
+import cache_figuras
+import espacial
+import estadisticas
+import mapas
+import validacion
 
 # Configuracion de pagina
 st.set_page_config(
@@ -22,17 +47,18 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Obtener directorio del script
-try:
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-except:
-    SCRIPT_DIR = "."
+# Grupos SISBEN incluidos por defecto (los que se precalientan al arrancar)
+GRUPOS_POR_DEFECTO = ['A', 'B', 'C']
 
-# Archivos de datos
-DATA_FILE = os.path.join(SCRIPT_DIR, 'Tabla_Completa_Priorizacion_JCO.xlsx')
-SHAPEFILE_PATH = os.path.join(SCRIPT_DIR, 'UPZ06_22', 'pensionadosupz_0622.shp')
-GEO_EXCEL = os.path.join(SCRIPT_DIR, 'upz-bogota-para-shape-con-resultad.xlsx')
-BRECHAS_FILE = os.path.join(SCRIPT_DIR, 'brechas_por_upz.csv')
+# Las 15 combinaciones no vacias de grupos SISBEN ('A', 'A+B', ..., 'A+B+C+D')
+COMBINACIONES_GRUPOS = [
+    list(c) for n in range(1, 5) for c in itertools.combinations(['A', 'B', 'C', 'D'], n)
+]
+
+# Tamano maximo (en bytes) de la cache compartida de figuras serializadas
+CACHE_FIGURAS_MAX_BYTES = 200 * 1024 * 1024
+# Tamano maximo (en bytes) de la cache de imagenes del modo liviano
+CACHE_IMAGENES_MAX_BYTES = 64 * 1024 * 1024
 
 # CSS personalizado
 st.markdown("""
@@ -98,7 +124,7 @@ LOCALIDADES_MAP = {
 @st.cache_data
 def cargar_datos():
     try:
-        df = pd.read_excel(DATA_FILE)
+        df = pd.read_excel(validacion.DATA_FILE)
         return df
     except Exception as e:
         st.error(f"Error cargando datos: {e}")
@@ -108,14 +134,9 @@ def cargar_datos():
 def cargar_shapefile():
     """Cargar shapefile con geometrias de UPZ"""
     try:
-        if os.path.exists(SHAPEFILE_PATH):
-            gdf = gpd.read_file(SHAPEFILE_PATH)
-            # Filtrar solo UPZ (excluir UPR rurales)
-            gdf = gdf[gdf['UPLCODIGO'].str.startswith('UPZ', na=False)].copy()
-            gdf['CODIGO_UPZ'] = gdf['UPLCODIGO'].str.replace('UPZ', '').astype(int)
-            # Reproyectar a WGS84
-            gdf = gdf.to_crs(epsg=4326)
-            return gdf
+        if os.path.exists(validacion.SHAPEFILE_PATH):
+            # Solo UPZ (sin UPR rurales), reproyectado a WGS84
+            return validacion.leer_shapefile()
         else:
             return None
     except Exception as e:
@@ -126,7 +147,7 @@ def cargar_shapefile():
 def cargar_geodatos_excel():
     """Cargar geodatos desde Excel (fallback)"""
     try:
-        geo = pd.read_excel(GEO_EXCEL)
+        geo = pd.read_excel(validacion.GEO_EXCEL)
         return geo
     except:
         return None
@@ -135,12 +156,90 @@ def cargar_geodatos_excel():
 def cargar_brechas():
     """Carga los datos pre-calculados de brechas por UPZ (beneficiarios ruta corta vs vulnerables SISBEN)"""
     try:
-        df = pd.read_csv(BRECHAS_FILE)
+        df = pd.read_csv(validacion.BRECHAS_FILE)
         return df
     except Exception as e:
         st.warning(f"No se pudo cargar datos de brechas: {e}")
         return None
 
+def cargar_fuentes_en_paralelo():
+    """
+    Lee en un pool de hilos las fuentes independientes (poblacion, brechas y
+    geometria); el Excel de geodatos solo se lee si no esta el shapefile
+
+    Returns:
+        Tupla (df poblacion, df brechas, gdf shapefile, df geodatos Excel)
+    """
+    # Los hilos comparten el contexto de la sesion para que st.warning/st.stop
+    # de los cargadores lleguen a la pagina
+    ctx = get_script_run_ctx()
+
+    def con_contexto(cargador):
+        def ejecutar():
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return cargador()
+        return ejecutar
+
+    cargadores = [cargar_datos, cargar_brechas, cargar_shapefile]
+    if not os.path.exists(validacion.SHAPEFILE_PATH):
+        cargadores.append(cargar_geodatos_excel)
+
+    with ThreadPoolExecutor(max_workers=len(cargadores)) as pool:
+        futuros = [pool.submit(con_contexto(c)) for c in cargadores]
+        df, df_brechas, gdf = (f.result() for f in futuros[:3])
+        geo_excel = futuros[3].result() if len(futuros) > 3 else None
+
+    # Shapefile presente pero ilegible: se recurre al Excel
+    if gdf is None and geo_excel is None:
+        geo_excel = cargar_geodatos_excel()
+    return df, df_brechas, gdf, geo_excel
+
+@st.cache_resource
+def cargar_tabla_hechos():
+    """
+    Tabla de hechos validada: poblacion, brechas y geometria en una sola tabla
+
+    Usa el artefacto compilado por validacion.py si corresponde a las fuentes
+    actuales; si no, valida y une las fuentes al arrancar y deja escrito el
+    artefacto para los siguientes arranques. Cada UPZ queda en
+    una posicion fija (indice entero denso IDX_UPZ, ordenado por CODIGO_UPZ),
+    de modo que las vistas son recortes posicionales de esta tabla.
+
+    Los hallazgos se devuelven en lugar de mostrarse aqui: los elementos de una
+    funcion cacheada se repiten cada vez que se llama, y se llama tambien desde
+    preparar_servidor.
+
+    Returns:
+        Tupla (GeoDataFrame de hechos en EPSG:4326, origen de la geometria o None,
+        lista de avisos de las fuentes que usa el tablero)
+    """
+    artefacto = validacion.cargar_artefacto()
+    if artefacto is not None:
+        hechos, origen, reporte = artefacto
+    else:
+        df, df_brechas, gdf, geo_excel = cargar_fuentes_en_paralelo()
+        try:
+            hechos, origen, reporte = validacion.construir_tabla_hechos(df, df_brechas, gdf, geo_excel)
+        except validacion.ErrorValidacion as e:
+            st.error(f"Error validando datos: {e}")
+            st.stop()
+        try:
+            validacion.guardar_artefacto(hechos, reporte, validacion.huella_fuentes())
+        except OSError:
+            # Sin permiso de escritura se sigue con la tabla en memoria
+            pass
+        reporte = reporte.a_dict()
+
+    # Solo se muestran los hallazgos de las fuentes que usa el tablero
+    fuentes_usadas = {'poblacion', 'brechas', origen}
+    avisos = [h['mensaje'] for h in reporte['hallazgos'] if h['fuente'] in fuentes_usadas]
+    return hechos, origen, avisos
+
+@st.cache_resource
+def geometrias_geojson(_hechos):
+    """Geometria GeoJSON de cada UPZ en el orden de IDX_UPZ (se serializa una sola vez)"""
+    return [None if g is None else json.loads(g) for g in shapely.to_geojson(_hechos.geometry.values)]
+
 def calcular_ranking_dinamico(df, grupos_seleccionados):
     """
     Recalcula el ranking basado en los grupos SISBEN seleccionados
@@ -164,96 +263,471 @@ def calcular_ranking_dinamico(df, grupos_seleccionados):
     df_calc['MUJERES_SEL'] = df_calc[col_mujeres].sum(axis=1)
 
     # Ordenar por poblacion seleccionada y asignar nuevo ranking
-    df_calc = df_calc.sort_values('POB_SELECCIONADA', ascending=False).reset_index(drop=True)
+    # (se conserva el indice IDX_UPZ para recortar la geometria por posicion)
+    df_calc = df_calc.sort_values('POB_SELECCIONADA', ascending=False, kind='stable')
     df_calc['RANKING_DINAMICO'] = range(1, len(df_calc) + 1)
 
     return df_calc
 
 @st.cache_data
-def crear_limites_localidades(_gdf, df_datos):
+def calcular_rankings_escenarios(_hechos):
+    """
+    Poblacion y ranking de todas las UPZ para las 15 combinaciones de grupos a la vez
+
+    La poblacion de cada combinacion es un producto matricial (UPZ x grupos por
+    grupos x combinaciones) y los 15 rankings salen de un solo argsort por
+    columnas, con el mismo desempate que calcular_ranking_dinamico.
+
+    Returns:
+        Tupla (poblacion, ranking): DataFrames indexados por IDX_UPZ con una
+        columna por combinacion ('A', 'A+B', ...)
+    """
+    grupos = _hechos[[f'GRUPO_{g}' for g in ['A', 'B', 'C', 'D']]].to_numpy()
+    seleccion = np.array(
+        [[g in combinacion for combinacion in COMBINACIONES_GRUPOS] for g in ['A', 'B', 'C', 'D']],
+        dtype=grupos.dtype
+    )
+    poblacion = grupos @ seleccion
+
+    orden = np.argsort(-poblacion, axis=0, kind='stable')
+    ranking = np.empty_like(orden)
+    posiciones = np.broadcast_to(np.arange(1, len(orden) + 1)[:, None], orden.shape)
+    np.put_along_axis(ranking, orden, posiciones, axis=0)
+
+    columnas = ['+'.join(c) for c in COMBINACIONES_GRUPOS]
+    return (
+        pd.DataFrame(poblacion, index=_hechos.index, columns=columnas),
+        pd.DataFrame(ranking, index=_hechos.index, columns=columnas),
+    )
+
+def comparar_escenarios(hechos, poblacion, ranking, escenario_base, escenario_comparado):
+    """
+    Diferencias de ranking y poblacion entre dos combinaciones de grupos
+
+    DELTA_RANKING es positivo cuando la UPZ sube (mejor puesto) en el escenario comparado.
+
+    Returns:
+        GeoDataFrame indexado por IDX_UPZ
+    """
+    df_comp = hechos[['CODIGO_UPZ', 'UPZ', 'LOCALIDAD', 'geometry']].copy()
+    df_comp['RANKING_BASE'] = ranking[escenario_base]
+    df_comp['RANKING_COMP'] = ranking[escenario_comparado]
+    df_comp['DELTA_RANKING'] = df_comp['RANKING_BASE'] - df_comp['RANKING_COMP']
+    df_comp['POB_BASE'] = poblacion[escenario_base]
+    df_comp['POB_COMP'] = poblacion[escenario_comparado]
+    df_comp['DELTA_POB'] = df_comp['POB_COMP'] - df_comp['POB_BASE']
+    return df_comp
+
+def calcular_brecha_dinamica(hechos, grupos_seleccionados):
+    """
+    Recalcula cobertura y brecha tomando como vulnerables solo los grupos seleccionados
+
+    Args:
+        hechos: Tabla de hechos por UPZ (incluye los datos de brechas_por_upz.csv)
+        grupos_seleccionados: Lista de grupos a incluir ('A', 'B', 'C', 'D')
+
+    Returns:
+        DataFrame de las UPZ con datos de brecha, con VULNERABLES_SEL, TASA_COB_DIN y BRECHA_DIN
+    """
+    df_calc = hechos[hechos['BENEFICIARIOS_RUTA_CORTA'].notna()].copy()
+
+    # Sumar solo los grupos seleccionados como referencia de vulnerables
+    df_calc['VULNERABLES_SEL'] = df_calc[[f'GRUPO_{g}' for g in grupos_seleccionados]].sum(axis=1)
+
+    # Desagregado por sexo de los vulnerables seleccionados
+    for sexo in ['HOMBRES', 'MUJERES']:
+        df_calc[f'{sexo}_SEL'] = df_calc[[f'{sexo}_{g}' for g in grupos_seleccionados]].sum(axis=1)
+
+    df_calc['TASA_COB_DIN'] = (
+        df_calc['BENEFICIARIOS_RUTA_CORTA'] / df_calc['VULNERABLES_SEL'] * 100
+    ).round(1)
+    # Evitar division por cero
+    df_calc.loc[df_calc['VULNERABLES_SEL'] == 0, 'TASA_COB_DIN'] = 0
+
+    df_calc['BRECHA_DIN'] = df_calc['VULNERABLES_SEL'] - df_calc['BENEFICIARIOS_RUTA_CORTA']
+
+    return df_calc
+
+@st.cache_resource
+def crear_pesos_espaciales(_hechos):
+    """
+    Matriz dispersa de vecindad (contiguidad tipo reina) entre UPZ
+
+    Se calcula una sola vez por proceso a partir de la geometria de la tabla de
+    hechos; filas y columnas siguen el orden de IDX_UPZ.
+
+    Returns:
+        Matriz binaria CSR simetrica
+    """
+    # Se trabaja en metros para que la tolerancia sea comparable entre UPZ
+    geometrias = _hechos.geometry.to_crs(epsg=3857).values
+    arbol = shapely.STRtree(geometrias)
+    # Tolerancia de 1 m para cerrar huecos de digitalizacion entre UPZ vecinas
+    i, j = arbol.query(shapely.buffer(geometrias, 1.0), predicate='intersects')
+    distintos = i != j
+
+    n = len(geometrias)
+    w = sparse.csr_matrix(
+        (np.ones(distintos.sum()), (i[distintos], j[distintos])), shape=(n, n)
+    )
+    return ((w + w.T) > 0).astype(float).tocsr()
+
+@st.cache_data
+def calcular_puntos_calientes(_hechos, grupos_seleccionados, significancia=0.05):
+    """
+    Clasifica las UPZ en puntos calientes/frios (Gi*) y clusters (Moran local)
+    segun la brecha de los grupos seleccionados. Se calcula sobre toda la ciudad.
+
+    Returns:
+        DataFrame alineado con la tabla de hechos (una fila por IDX_UPZ)
+    """
+    w = crear_pesos_espaciales(_hechos)
+    brecha = calcular_brecha_dinamica(_hechos, grupos_seleccionados)
+
+    # Solo UPZ con datos de brecha; se recorta la matriz a esas posiciones
+    posiciones = brecha.index.to_numpy()
+    w = w[posiciones][:, posiciones]
+
+    stats = estadisticas.estadisticas_locales(brecha['BRECHA_DIN'].to_numpy(), w)
+    stats.index = brecha.index
+
+    sig_gi = stats['GI_P'] < significancia
+    stats['CLASE_GI'] = np.select(
+        [sig_gi & (stats['GI_Z'] > 0), sig_gi & (stats['GI_Z'] < 0)],
+        ['Punto caliente', 'Punto frio'],
+        default='No significativo'
+    )
+
+    sig_moran = stats['MORAN_P'] < significancia
+    alto, rezago_alto = stats['Z'] > 0, stats['REZAGO'] > 0
+    stats['CLASE_MORAN'] = np.select(
+        [sig_moran & alto & rezago_alto, sig_moran & ~alto & ~rezago_alto,
+         sig_moran & alto & ~rezago_alto, sig_moran & ~alto & rezago_alto],
+        ['Alto-Alto', 'Bajo-Bajo', 'Alto-Bajo', 'Bajo-Alto'],
+        default='No significativo'
+    )
+
+    return stats.drop(columns=['Z', 'REZAGO']).reindex(_hechos.index)
+
+@st.cache_resource
+def obtener_cache_figuras():
+    """Instancia unica de la cache de figuras para todo el proceso"""
+    return cache_figuras.CacheFiguras(CACHE_FIGURAS_MAX_BYTES)
+
+@st.cache_resource
+def obtener_cache_imagenes():
+    """Instancia unica de la cache de imagenes del modo liviano para todo el proceso"""
+    return cache_figuras.CacheFiguras(CACHE_IMAGENES_MAX_BYTES)
+
+def obtener_figura(clave, construir):
+    """
+    Devuelve el JSON (bytes) de la figura asociada a la clave del estado de filtros
+
+    Si no esta en cache se construye con construir() y se guarda serializada;
+    en un acierto se devuelven los bytes guardados sin reconstruir la figura.
+    """
+    cache = obtener_cache_figuras()
+    datos = cache.obtener(clave)
+    if datos is None:
+        fig = construir()
+        if fig is None:
+            return None
+        datos = pio.to_json(fig, validate=False).encode('utf-8')
+        cache.guardar(clave, datos)
+    return datos
+
+def mostrar_figura(datos, altura, contenedor=None):
+    """
+    Envia al navegador una figura ya serializada, sin pasar por st.plotly_chart
+
+    st.plotly_chart reconstruye y valida un go.Figure a partir del dict y lo
+    vuelve a serializar: mas de un segundo por mapa de UPZ aun con la figura en
+    cache. Aqui el JSON de la cache va tal cual al elemento plotly_chart.
+
+    El envio directo usa API interna de Streamlit; si falta o cambio de firma
+    en otra version, se cae a st.plotly_chart (mas lento, pero correcto).
+
+    Args:
+        datos: JSON de la figura (bytes o str)
+        altura: Alto en pixeles (el height del layout de la figura)
+        contenedor: Donde dibujar (columna, pestaña, st.empty...). Por defecto,
+            el contenedor activo del script (el del bloque `with` en curso)
+    """
+    spec = datos.decode('utf-8') if isinstance(datos, bytes) else datos
+    destino = contenedor if contenedor is not None else st._main._active_dg
+    if PlotlyChartProto is not None:
+        try:
+            proto = PlotlyChartProto()
+            proto.theme = 'streamlit'
+            proto.spec = spec
+            proto.config = json.dumps({})
+            proto.id = compute_and_register_element_id(
+                'plotly_chart', user_key=None, key_as_main_identity=False, dg=destino,
+                plotly_spec=proto.spec, plotly_config=proto.config, theme='streamlit',
+                width='stretch', height=altura
+            )
+            destino._enqueue('plotly_chart', proto, layout_config=LayoutConfig(width='stretch', height=altura))
+            return
+        except Exception:
+            pass
+    destino.plotly_chart(json.loads(spec), width='stretch')
+
+@st.cache_data
+def crear_limites_localidades(_hechos):
     """Crear GeoJSON con los contornos de localidades, agrupando UPZ por localidad"""
     try:
-        # Se cruza el shapefile de UPZ con los datos para obtener la localidad de cada UPZ
-        merged = _gdf.merge(
-            df_datos[['CODIGO_UPZ', 'LOCALIDAD']].drop_duplicates(),
-            on='CODIGO_UPZ', how='inner'
-        )
         # Se disuelven (unen) las geometrias de UPZ que pertenecen a la misma localidad
-        localidades = merged.dissolve(by='LOCALIDAD').reset_index()
+        con_geometria = _hechos[_hechos.geometry.notna()]
+        localidades = con_geometria[['LOCALIDAD', 'geometry']].dissolve(by='LOCALIDAD').reset_index()
         # Se convierte a GeoJSON para usarlo como capa en el mapa
         return json.loads(localidades[['LOCALIDAD', 'geometry']].to_json())
     except Exception:
         return None
 
-def crear_geojson_desde_shapefile(gdf, df_datos):
-    """Crear GeoJSON combinando shapefile con datos"""
-    features = []
+@st.cache_resource
+def geometria_proyectada(_hechos):
+    """Geometria en EPSG:3857 lista para dibujar (mapas.proyectar_geometria), una vez por proceso"""
+    return mapas.proyectar_geometria(_hechos)
 
-    merged = gdf.merge(df_datos, on='CODIGO_UPZ', how='inner')
+def extension_vista(hechos, df_datos, margen=0.03):
+    """Extension (x0, y0, x1, y1) en EPSG:3857 que encuadra las UPZ de df_datos"""
+    return mapas.extension_vista(geometria_proyectada(hechos), df_datos.index.to_numpy(), margen)
 
-    for idx, row in merged.iterrows():
-        try:
-            geom = row.geometry.__geo_interface__
-            feature = {
-                "type": "Feature",
-                "id": str(row['CODIGO_UPZ']),
-                "properties": {
-                    "CODIGO_UPZ": int(row['CODIGO_UPZ']),
-                    "UPZ": row.get('UPZ', row.get('NOMBRE', '')),
-                    "LOCALIDAD": row.get('LOCALIDAD', 'Sin datos'),
-                    "RANKING": int(row.get('RANKING_DINAMICO', row.get('RANKING', 0))),
-                    "POB_SELECCIONADA": int(row.get('POB_SELECCIONADA', 0)),
-                    "JOVENES_TOTAL": int(row.get('JOVENES_TOTAL', 0)),
-                    "GRUPO_A": int(row.get('GRUPO_A', 0)),
-                    "GRUPO_B": int(row.get('GRUPO_B', 0)),
-                    "GRUPO_C": int(row.get('GRUPO_C', 0)),
-                    "GRUPO_D": int(row.get('GRUPO_D', 0)),
-                },
-                "geometry": geom
-            }
-            features.append(feature)
-        except Exception as e:
-            continue
+def mostrar_mapa_liviano(hechos, df_datos, clave, detalle, altura=650, **kwargs_raster):
+    """
+    Muestra el mapa como imagen (desde la cache de imagenes) con consulta al tocar
 
-    return {"type": "FeatureCollection", "features": features}
+    La imagen va de fondo en una figura minima con un punto transparente por UPZ;
+    al tocar un punto se muestra el detalle de esa UPZ en lugar del hover.
 
-def crear_geojson_desde_excel(geo_df, df_datos):
-    """Crear GeoJSON desde Excel (fallback)"""
-    features = []
+    Args:
+        detalle: dict columna -> etiqueta de los campos a mostrar de la UPZ tocada
+        kwargs_raster: argumentos de mapas.renderizar_mapa_raster
+    """
+    if df_datos.geometry.notna().sum() == 0:
+        st.info("No hay UPZ con geometria para los filtros actuales")
+        return
+
+    cache = obtener_cache_imagenes()
+    imagen = cache.obtener(clave)
+    if imagen is None:
+        imagen = mapas.renderizar_mapa_raster(geometria_proyectada(hechos), df_datos, **kwargs_raster)
+        cache.guardar(clave, imagen)
+
+    x0, y0, x1, y1 = extension_vista(hechos, df_datos)
+    puntos = geometria_proyectada(hechos)['puntos'][df_datos.index.to_numpy()]
+
+    fig = go.Figure(go.Scatter(
+        x=puntos[:, 0], y=puntos[:, 1],
+        mode='markers',
+        marker=dict(size=14, color='rgba(30, 58, 95, 0.25)'),
+        customdata=df_datos.index.to_numpy(),
+        hoverinfo='none'
+    ))
+    fig.add_layout_image(
+        source='data:image/webp;base64,' + base64.b64encode(imagen).decode('ascii'),
+        xref='x', yref='y', x=x0, y=y1, sizex=x1 - x0, sizey=y1 - y0,
+        sizing='stretch', layer='below'
+    )
+    fig.update_xaxes(visible=False, range=[x0, x1])
+    fig.update_yaxes(visible=False, range=[y0, y1], scaleanchor='x')
+    fig.update_layout(
+        height=altura, margin=dict(l=0, r=0, t=0, b=0), dragmode=False,
+        plot_bgcolor='white', showlegend=False
+    )
+
+    evento = st.plotly_chart(
+        fig, width='stretch', on_select='rerun', selection_mode='points',
+        key=f"liviano_{clave[0]}", config={'displayModeBar': False}
+    )
+    st.caption(f"Imagen de {len(imagen) / 1024:,.0f} KB. Toca el punto de una UPZ para ver su detalle.")
+
+    # La seleccion guarda IDX_UPZ; puede venir de una vista anterior con otros filtros
+    seleccion = [p.get('customdata') for p in (evento.selection.points if evento else [])]
+    seleccion = [idx for idx in seleccion if idx in df_datos.index]
+    if seleccion:
+        upz = df_datos.loc[seleccion[0]]
+        st.markdown(f"**{upz['UPZ']}** ({upz['LOCALIDAD']})")
+        columnas = st.columns(len(detalle))
+        for columna, (col, etiqueta) in zip(columnas, detalle.items()):
+            valor = upz[col]
+            if isinstance(valor, (int, np.integer)):
+                valor = f"{valor:,}"
+            elif isinstance(valor, (float, np.floating)):
+                valor = f"{valor:,.2f}"
+            with columna:
+                st.metric(etiqueta, valor)
+
+# Columnas del hover del mapa de asignacion de cupos (customdata), en orden
+COLUMNAS_HOVER_ASIGNACION = [
+    'LOCALIDAD', 'VULNERABLES_SEL', 'BENEFICIARIOS_RUTA_CORTA', 'TASA_COB_DIN',
+    'BRECHA_DIN', 'CUPOS', 'TASA_COB_NUEVA', 'BRECHA_NUEVA'
+]
 
-    merged = geo_df.merge(df_datos, on='CODIGO_UPZ', how='inner')
+def hover_asignacion(grupos_seleccionados):
+    """Plantilla de hover del mapa de asignacion sobre COLUMNAS_HOVER_ASIGNACION"""
+    return (
+        "<b>%{hovertext}</b><br>"
+        "Localidad=%{customdata[0]}<br>"
+        f"Vulnerables ({'+'.join(grupos_seleccionados)})=%{{customdata[1]:,}}<br>"
+        "Beneficiarios=%{customdata[2]:,}<br>"
+        "Cobertura %=%{customdata[3]}<br>"
+        "Brecha=%{customdata[4]:,}<br>"
+        "Cupos nuevos=%{customdata[5]:,}<br>"
+        "Cobertura con cupos %=%{customdata[6]}<br>"
+        "Brecha con cupos=%{customdata[7]:,}<extra></extra>"
+    )
+
+def actualizar_mapa_asignacion(fig, df_asig):
+    """
+    Pone una asignacion de cupos sobre la figura base (dict) del mapa de asignacion
 
-    for _, row in merged.iterrows():
-        try:
-            geo_shape = json.loads(row['geo_shape'])
-            feature = {
-                "type": "Feature",
-                "id": str(row['CODIGO_UPZ']),
-                "properties": {
-                    "CODIGO_UPZ": int(row['CODIGO_UPZ']),
-                    "UPZ": row.get('UPZ', ''),
-                    "LOCALIDAD": row.get('LOCALIDAD', 'Sin datos'),
-                    "RANKING": int(row.get('RANKING_DINAMICO', row.get('RANKING', 0))),
-                    "POB_SELECCIONADA": int(row.get('POB_SELECCIONADA', 0)),
-                    "JOVENES_TOTAL": int(row.get('JOVENES_TOTAL', 0)),
-                    "GRUPO_A": int(row.get('GRUPO_A', 0)),
-                    "GRUPO_B": int(row.get('GRUPO_B', 0)),
-                    "GRUPO_C": int(row.get('GRUPO_C', 0)),
-                    "GRUPO_D": int(row.get('GRUPO_D', 0)),
-                },
-                "geometry": geo_shape
-            }
-            features.append(feature)
-        except:
-            continue
+    La geometria y los contornos no cambian con la capacidad; la figura base
+    tiene una UPZ por fila de df_asig en el mismo orden, asi que solo se
+    reemplazan el color, el hover y el maximo de la escala.
+    """
+    traza = fig['data'][0]
+    traza['z'] = df_asig['CUPOS'].tolist()
+    traza['customdata'] = df_asig[COLUMNAS_HOVER_ASIGNACION].astype(object).to_numpy().tolist()
+    fig['layout']['coloraxis']['cmax'] = max(int(df_asig['CUPOS'].max()), 1)
+
+def crear_geojson(hechos, df_datos):
+    """
+    Crear GeoJSON de las UPZ de df_datos tomando la geometria por posicion (IDX_UPZ)
+
+    Los conteos de la tabla de hechos ya vienen validados como enteros sin
+    vacios, asi que las propiedades se arman por columnas y no fila por fila.
+    """
+    geometrias = geometrias_geojson(hechos)
+    posiciones = df_datos.index.to_numpy()
+    posiciones = posiciones[hechos.geometry.notna().to_numpy()[posiciones]]
+    base = hechos.iloc[posiciones]
+    datos = df_datos.loc[posiciones]
+
+    propiedades = pd.DataFrame({
+        'CODIGO_UPZ': base['CODIGO_UPZ'],
+        'UPZ': base['UPZ'],
+        'LOCALIDAD': base['LOCALIDAD'],
+        'RANKING': datos['RANKING_DINAMICO'] if 'RANKING_DINAMICO' in datos else base['RANKING'],
+        'POB_SELECCIONADA': datos['POB_SELECCIONADA'] if 'POB_SELECCIONADA' in datos else 0,
+        'JOVENES_TOTAL': base['JOVENES_TOTAL'],
+        'GRUPO_A': base['GRUPO_A'],
+        'GRUPO_B': base['GRUPO_B'],
+        'GRUPO_C': base['GRUPO_C'],
+        'GRUPO_D': base['GRUPO_D'],
+    })
+    features = [
+        {"type": "Feature", "id": str(codigo), "properties": props, "geometry": geometrias[pos]}
+        for pos, codigo, props in zip(posiciones, propiedades['CODIGO_UPZ'].tolist(), propiedades.to_dict('records'))
+    ]
 
     return {"type": "FeatureCollection", "features": features}
 
-# Cargar datos
-df = cargar_datos()
-gdf = cargar_shapefile()
-geo_excel = cargar_geodatos_excel()
-df_brechas = cargar_brechas()
+# Nombres habituales de las columnas de coordenadas en los archivos de campo
+NOMBRES_LONGITUD = ['lon', 'lng', 'long', 'longitud', 'longitude', 'x']
+NOMBRES_LATITUD = ['lat', 'latitud', 'latitude', 'y']
+
+@st.cache_resource
+def indice_espacial_upz(_hechos):
+    """Indice espacial de las UPZ (ver espacial.construir_indice), uno por proceso"""
+    return espacial.construir_indice(_hechos)
+
+def ubicar_puntos(hechos, lon, lat):
+    """IDX_UPZ de la UPZ que contiene cada punto (-1 si ninguna), sobre el indice cacheado"""
+    return espacial.ubicar_puntos(indice_espacial_upz(hechos), lon, lat)
+
+@st.cache_data(max_entries=4)
+def leer_coordenadas(contenido):
+    """
+    Lee el CSV subido; se cachea por contenido del archivo
+
+    El separador se detecta en las primeras lineas. Con ';' se asume la coma
+    decimal (CSV exportado por Excel en espanol).
+    """
+    muestra = contenido[:8192].decode('utf-8', errors='ignore')
+    try:
+        separador = csv.Sniffer().sniff(muestra, delimiters=',;\t|').delimiter
+    except csv.Error:
+        separador = ','
+    return pd.read_csv(io.BytesIO(contenido), sep=separador, decimal=',' if separador == ';' else '.')
+
+def columna_por_nombre(columnas, nombres):
+    """Primera columna cuyo nombre (sin mayusculas ni espacios) esta en nombres, o None"""
+    for col in columnas:
+        if str(col).strip().lower() in nombres:
+            return col
+    return None
+
+@st.cache_data(max_entries=4)
+def enriquecer_coordenadas(_hechos, contenido, col_lon, col_lat, grupos_tuple):
+    """
+    Ubica cada punto del CSV en su UPZ y le une el ranking y la brecha actuales
+
+    Args:
+        contenido: Bytes del CSV subido (clave de la cache junto con las columnas y grupos)
+        col_lon, col_lat: Columnas de longitud y latitud (WGS84)
+        grupos_tuple: Grupos SISBEN seleccionados
+
+    Returns:
+        Tupla (DataFrame enriquecido, CSV enriquecido en bytes)
+    """
+    df_puntos = leer_coordenadas(contenido)
+    lon = pd.to_numeric(df_puntos[col_lon], errors='coerce').to_numpy(dtype=float)
+    lat = pd.to_numeric(df_puntos[col_lat], errors='coerce').to_numpy(dtype=float)
+    posiciones = ubicar_puntos(_hechos, lon, lat)
+
+    # Atributos por UPZ en el orden de IDX_UPZ; la posicion -1 queda vacia
+    grupos = list(grupos_tuple)
+    atributos = pd.DataFrame({
+        'CODIGO_UPZ': _hechos['CODIGO_UPZ'],
+        'UPZ': _hechos['UPZ'],
+        'LOCALIDAD': _hechos['LOCALIDAD'],
+        'RANKING_DINAMICO': calcular_ranking_dinamico(_hechos, grupos)['RANKING_DINAMICO'],
+    })
+    if 'BENEFICIARIOS_RUTA_CORTA' in _hechos.columns:
+        atributos['BRECHA_DIN'] = calcular_brecha_dinamica(_hechos, grupos)['BRECHA_DIN']
+    atributos = atributos.astype({c: 'Int64' for c in atributos.columns if c not in ['UPZ', 'LOCALIDAD']})
+
+    enriquecido = atributos.reindex(posiciones)
+    enriquecido.index = df_puntos.index
+    # Las columnas nuevas reemplazan a las del archivo con el mismo nombre
+    enriquecido = pd.concat([df_puntos.drop(columns=atributos.columns, errors='ignore'), enriquecido], axis=1)
+    return enriquecido, enriquecido.to_csv(index=False).encode('utf-8')
+
+@st.cache_resource
+def preparar_servidor():
+    """
+    Arranque del proceso: carga las fuentes y precalienta las caches derivadas
+
+    Se ejecuta una sola vez por proceso; las sesiones que llegan mientras corre
+    esperan al mismo calculo. Con servidor.py corre al iniciar el proceso, en la
+    ejecucion interna de calentamiento, antes de la primera visita.
+
+    Returns:
+        dict con el estado del arranque (segundos, inicio)
+    """
+    inicio = time.perf_counter()
+    hechos, origen, _ = cargar_tabla_hechos()
+
+    if origen is not None:
+        geometrias_geojson(hechos)
+        geometria_proyectada(hechos)
+        crear_limites_localidades(hechos)
+        indice_espacial_upz(hechos)
+        if 'BENEFICIARIOS_RUTA_CORTA' in hechos.columns:
+            calcular_puntos_calientes(hechos, tuple(GRUPOS_POR_DEFECTO))
+
+    return {
+        'segundos': time.perf_counter() - inicio,
+        'inicio': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M'),
+    }
+
+# Cargar datos (tabla de hechos unica por UPZ)
+estado_servidor = preparar_servidor()
+hechos, origen_geometria, avisos_datos = cargar_tabla_hechos()
+for aviso in avisos_datos:
+    st.warning(aviso)
+hay_brechas = 'BENEFICIARIOS_RUTA_CORTA' in hechos.columns
 
 # Header principal
 st.markdown('<h1 class="main-header">Tablero de priorizacion con datos del SISBEN</h1>', unsafe_allow_html=True)
@@ -282,11 +756,11 @@ st.sidebar.markdown("""
 
 col_a, col_b = st.sidebar.columns(2)
 with col_a:
-    incluir_a = st.checkbox("Grupo A", value=True, help="Pobreza Extrema")
-    incluir_c = st.checkbox("Grupo C", value=True, help="Vulnerable")
+    incluir_a = st.checkbox("Grupo A", value='A' in GRUPOS_POR_DEFECTO, help="Pobreza Extrema")
+    incluir_c = st.checkbox("Grupo C", value='C' in GRUPOS_POR_DEFECTO, help="Vulnerable")
 with col_b:
-    incluir_b = st.checkbox("Grupo B", value=True, help="Pobreza Moderada")
-    incluir_d = st.checkbox("Grupo D", value=False, help="No Vulnerable")
+    incluir_b = st.checkbox("Grupo B", value='B' in GRUPOS_POR_DEFECTO, help="Pobreza Moderada")
+    incluir_d = st.checkbox("Grupo D", value='D' in GRUPOS_POR_DEFECTO, help="No Vulnerable")
 
 grupos_seleccionados = []
 if incluir_a: grupos_seleccionados.append('A')
@@ -296,7 +770,7 @@ if incluir_d: grupos_seleccionados.append('D')
 
 if not grupos_seleccionados:
     st.sidebar.error("Selecciona al menos un grupo")
-    grupos_seleccionados = ['A', 'B', 'C']
+    grupos_seleccionados = list(GRUPOS_POR_DEFECTO)
 
 # Mostrar configuracion actual
 grupos_texto = ' + '.join([f"Grupo {g}" for g in grupos_seleccionados])
@@ -310,12 +784,19 @@ st.sidebar.markdown(f"""
 st.sidebar.markdown("---")
 st.sidebar.markdown("### Filtros adicionales")
 
+# Modo liviano para conexiones moviles: mapas como imagen en lugar de GeoJSON
+modo_liviano = st.sidebar.toggle(
+    "Modo liviano (mapas como imagen)",
+    value=False,
+    help="Dibuja los mapas en el servidor como una imagen comprimida. Util en conexiones moviles lentas."
+)
+
 # Filtro por localidad
-localidades = ['Todas las localidades'] + sorted(df['LOCALIDAD'].dropna().unique().tolist())
+localidades = ['Todas las localidades'] + sorted(hechos['LOCALIDAD'].dropna().unique().tolist())
 localidad_sel = st.sidebar.selectbox("Localidad", localidades)
 
 # Calcular ranking dinamico
-df_dinamico = calcular_ranking_dinamico(df, grupos_seleccionados)
+df_dinamico = calcular_ranking_dinamico(hechos, grupos_seleccionados)
 
 # Filtro por rango de ranking
 st.sidebar.markdown("### Rango de Priorizacion")
@@ -370,7 +851,10 @@ st.markdown("---")
 # ============================================
 # TABS PRINCIPALES
 # ============================================
-tab1, tab2, tab3, tab4 = st.tabs(["Mapa interactivo", "Localidades", "Brechas por UPZ", "Zonas calientes"])
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+    "Mapa interactivo", "Localidades", "Brechas por UPZ", "Zonas calientes", "Comparar escenarios",
+    "Ubicar coordenadas"
+])
 
 # ============================================
 # TAB 1: MAPA INTERACTIVO
@@ -379,18 +863,30 @@ with tab1:
     st.markdown("### Mapa de Priorizacion por UPZ")
     st.markdown(f"**Coloreado por:** Poblacion de Grupos {'+'.join(grupos_seleccionados)}")
 
-    # Crear GeoJSON
-    if gdf is not None:
-        geojson_data = crear_geojson_desde_shapefile(gdf, df_filtrado)
+    # Origen de las geometrias
+    if origen_geometria == 'shapefile':
         st.success("Usando shapefile con geometrias completas")
-    elif geo_excel is not None:
-        geojson_data = crear_geojson_desde_excel(geo_excel, df_filtrado)
+    elif origen_geometria == 'excel':
         st.info("Usando geodatos desde Excel")
     else:
         st.error("No hay datos geograficos disponibles")
-        geojson_data = None
 
-    if geojson_data and len(geojson_data['features']) > 0:
+    escala_priorizacion = [
+        [0, '#ffffcc'], [0.2, '#ffeda0'], [0.4, '#fed976'],
+        [0.5, '#feb24c'], [0.6, '#fd8d3c'], [0.7, '#fc4e2a'],
+        [0.8, '#e31a1c'], [0.9, '#bd0026'], [1, '#800026']
+    ]
+
+    def construir_mapa_priorizacion():
+        """Construye el mapa de priorizacion; solo se llama si no esta en la cache de figuras"""
+        # Crear GeoJSON
+        if origen_geometria is None:
+            return None
+        geojson_data = crear_geojson(hechos, df_filtrado)
+
+        if not geojson_data or len(geojson_data['features']) == 0:
+            return None
+
         # Preparar datos para mapa
         map_df = df_filtrado[['CODIGO_UPZ', 'UPZ', 'LOCALIDAD', 'POB_SELECCIONADA',
                               'JOVENES_TOTAL', 'RANKING_DINAMICO', 'GRUPO_A', 'GRUPO_B', 'GRUPO_C', 'GRUPO_D']].copy()
@@ -406,11 +902,7 @@ with tab1:
             locations='CODIGO_UPZ',
             featureidkey="id",
             color='POB_SELECCIONADA',
-            color_continuous_scale=[
-                [0, '#ffffcc'], [0.2, '#ffeda0'], [0.4, '#fed976'],
-                [0.5, '#feb24c'], [0.6, '#fd8d3c'], [0.7, '#fc4e2a'],
-                [0.8, '#e31a1c'], [0.9, '#bd0026'], [1, '#800026']
-            ],
+            color_continuous_scale=escala_priorizacion,
             range_color=[0, df_filtrado['POB_SELECCIONADA'].max()],
             hover_name='UPZ',
             hover_data={
@@ -444,15 +936,14 @@ with tab1:
 
         # Agregar contornos de localidades como capa sobre el mapa
         capas_localidades = []
-        if gdf is not None:
-            limites_loc = crear_limites_localidades(gdf, df)
-            if limites_loc:
-                capas_localidades = [{
-                    "source": limites_loc,
-                    "type": "line",
-                    "color": "rgba(0, 0, 0, 0.6)",
-                    "line": {"width": 2}
-                }]
+        limites_loc = crear_limites_localidades(hechos)
+        if limites_loc:
+            capas_localidades = [{
+                "source": limites_loc,
+                "type": "line",
+                "color": "rgba(0, 0, 0, 0.6)",
+                "line": {"width": 2}
+            }]
 
         fig_map.update_layout(
             height=650,
@@ -467,7 +958,30 @@ with tab1:
             )
         )
 
-        st.plotly_chart(fig_map, width='stretch')
+        return fig_map
+
+    clave_mapa = ('mapa', tuple(grupos_seleccionados), localidad_sel, (ranking_min, ranking_max), 'POB_SELECCIONADA')
+    if modo_liviano and origen_geometria is not None:
+        mostrar_mapa_liviano(
+            hechos, df_filtrado, ('mapa_liviano',) + clave_mapa[1:],
+            detalle={
+                'RANKING_DINAMICO': 'Ranking',
+                'POB_SELECCIONADA': f'Grupos {"+".join(grupos_seleccionados)}',
+                'JOVENES_TOTAL': 'Total Jovenes',
+                'GRUPO_A': 'Grupo A',
+                'GRUPO_B': 'Grupo B',
+                'GRUPO_C': 'Grupo C',
+                'GRUPO_D': 'Grupo D'
+            },
+            color_col='POB_SELECCIONADA',
+            escala=escala_priorizacion,
+            rango=[0, df_filtrado['POB_SELECCIONADA'].max()],
+            titulo=f'Grupos {"+".join(grupos_seleccionados)}'
+        )
+    else:
+        fig_map = obtener_figura(clave_mapa, construir_mapa_priorizacion)
+        if fig_map is not None:
+            mostrar_figura(fig_map, altura=650)
 
     # Panel informativo
     col1, col2 = st.columns([1, 1])
@@ -573,29 +1087,9 @@ with tab3:
     aun no estan siendo atendidos.
     """)
 
-    if df_brechas is not None:
+    if hay_brechas:
         # Recalcular brechas segun grupos seleccionados
-        df_brecha_dinamica = df_brechas.copy()
-
-        # Sumar solo los grupos seleccionados como referencia de vulnerables
-        col_grupos_brecha = [f'GRUPO_{g}' for g in grupos_seleccionados]
-        cols_disponibles_brecha = [c for c in col_grupos_brecha if c in df_brecha_dinamica.columns]
-
-        if cols_disponibles_brecha:
-            df_brecha_dinamica['VULNERABLES_SEL'] = df_brecha_dinamica[cols_disponibles_brecha].sum(axis=1)
-        else:
-            df_brecha_dinamica['VULNERABLES_SEL'] = df_brecha_dinamica['JOVENES_TOTAL']
-
-        # Recalcular cobertura y brecha con los grupos seleccionados
-        df_brecha_dinamica['TASA_COB_DIN'] = (
-            df_brecha_dinamica['BENEFICIARIOS_RUTA_CORTA'] / df_brecha_dinamica['VULNERABLES_SEL'] * 100
-        ).round(1)
-        # Evitar division por cero
-        df_brecha_dinamica.loc[df_brecha_dinamica['VULNERABLES_SEL'] == 0, 'TASA_COB_DIN'] = 0
-
-        df_brecha_dinamica['BRECHA_DIN'] = (
-            df_brecha_dinamica['VULNERABLES_SEL'] - df_brecha_dinamica['BENEFICIARIOS_RUTA_CORTA']
-        )
+        df_brecha_dinamica = calcular_brecha_dinamica(hechos, grupos_seleccionados)
 
         # Clasificar prioridad
         def clasificar(tasa):
@@ -691,12 +1185,12 @@ with tab3:
         # Tabla completa de brechas
         st.markdown("#### Tabla completa de brechas")
         tabla_brechas = df_brecha_vista[[
-            'UPZ', 'LOCALIDAD', 'VULNERABLES_SEL', 'BENEFICIARIOS_RUTA_CORTA',
-            'TASA_COB_DIN', 'BRECHA_DIN', 'PRIORIDAD'
+            'UPZ', 'LOCALIDAD', 'VULNERABLES_SEL', 'HOMBRES_SEL', 'MUJERES_SEL',
+            'BENEFICIARIOS_RUTA_CORTA', 'TASA_COB_DIN', 'BRECHA_DIN', 'PRIORIDAD'
         ]].copy()
         tabla_brechas.columns = [
             'UPZ', 'Localidad', f'Vulnerables ({"+".join(grupos_seleccionados)})',
-            'Beneficiarios', 'Cobertura %', 'Brecha', 'Prioridad'
+            'Hombres', 'Mujeres', 'Beneficiarios', 'Cobertura %', 'Brecha', 'Prioridad'
         ]
 
         # Aplicar colores de prioridad
@@ -713,6 +1207,8 @@ with tab3:
         st.dataframe(
             tabla_brechas.style.format({
                 f'Vulnerables ({"+".join(grupos_seleccionados)})': '{:,.0f}',
+                'Hombres': '{:,.0f}',
+                'Mujeres': '{:,.0f}',
                 'Beneficiarios': '{:,.0f}',
                 'Cobertura %': '{:.1f}%',
                 'Brecha': '{:,.0f}'
@@ -735,35 +1231,122 @@ with tab4:
     Las zonas mas oscuras son las que requieren mayor atencion.
     """)
 
-    if df_brechas is not None and (gdf is not None or geo_excel is not None):
+    if hay_brechas and origen_geometria is not None:
         # Recalcular con grupos seleccionados (misma logica que tab3)
-        df_calor = df_brechas.copy()
-        col_grupos_calor = [f'GRUPO_{g}' for g in grupos_seleccionados]
-        cols_disp_calor = [c for c in col_grupos_calor if c in df_calor.columns]
-
-        if cols_disp_calor:
-            df_calor['VULNERABLES_SEL'] = df_calor[cols_disp_calor].sum(axis=1)
-        else:
-            df_calor['VULNERABLES_SEL'] = df_calor['JOVENES_TOTAL']
-
-        df_calor['TASA_COB_DIN'] = (
-            df_calor['BENEFICIARIOS_RUTA_CORTA'] / df_calor['VULNERABLES_SEL'] * 100
-        ).round(1)
-        df_calor.loc[df_calor['VULNERABLES_SEL'] == 0, 'TASA_COB_DIN'] = 0
-        df_calor['BRECHA_DIN'] = df_calor['VULNERABLES_SEL'] - df_calor['BENEFICIARIOS_RUTA_CORTA']
+        df_calor = calcular_brecha_dinamica(hechos, grupos_seleccionados)
 
         # Filtro de localidad
         if localidad_sel != 'Todas las localidades':
             df_calor = df_calor[df_calor['LOCALIDAD'] == localidad_sel]
 
+        # Estadisticas espaciales locales; IDX_UPZ es la posicion en la tabla de hechos
+        df_hotspots = calcular_puntos_calientes(hechos, tuple(grupos_seleccionados))
+        df_hotspots = df_hotspots.iloc[df_calor.index]
+        for col in df_hotspots.columns:
+            df_calor[col] = df_hotspots[col].to_numpy()
+
         # Selector de variable para el mapa
         variable_mapa = st.radio(
             "Colorear el mapa por:",
-            ["Brecha absoluta", "Tasa de cobertura (%)"],
+            ["Brecha absoluta", "Tasa de cobertura (%)", "Puntos calientes (Gi*)", "Clusters (Moran local)",
+             "Asignacion de cupos"],
             horizontal=True
         )
 
-        if variable_mapa == "Brecha absoluta":
+        # Asignacion de nuevos cupos de ruta corta sobre las UPZ del mapa
+        parametros_asignacion = None
+        if variable_mapa == "Asignacion de cupos":
+            brecha_total = int(df_calor['BRECHA_DIN'].clip(lower=0).sum())
+            paso = int(10 ** max(0, np.floor(np.log10(max(brecha_total, 1) / 200))))
+            maximo_cupos = max(int(np.ceil(brecha_total / paso)) * paso, paso)
+
+            col_a1, col_a2 = st.columns(2)
+            with col_a1:
+                capacidad = st.slider(
+                    "Cupos nuevos a asignar",
+                    min_value=0,
+                    max_value=maximo_cupos,
+                    value=min(round(brecha_total * 0.1 / paso) * paso, maximo_cupos),
+                    step=paso
+                )
+            with col_a2:
+                objetivo_asignacion = st.radio(
+                    "Objetivo",
+                    ["Reducir la brecha ponderada", "Mas UPZ sobre un umbral de cobertura"],
+                    horizontal=True
+                )
+            umbral_cobertura = 50
+            if objetivo_asignacion == "Mas UPZ sobre un umbral de cobertura":
+                umbral_cobertura = st.slider("Umbral de cobertura (%)", 5, 100, 50, step=5)
+
+            with st.expander("Topes por localidad"):
+                topes_editados = st.data_editor(
+                    pd.DataFrame({
+                        'Localidad': sorted(df_calor['LOCALIDAD'].unique()),
+                        'Tope de cupos': np.nan
+                    }),
+                    column_config={
+                        'Tope de cupos': st.column_config.NumberColumn(min_value=0, step=1, help="Vacio = sin tope")
+                    },
+                    disabled=['Localidad'],
+                    hide_index=True,
+                    width='stretch'
+                )
+            topes_editados = topes_editados.dropna(subset=['Tope de cupos'])
+            topes_localidad = dict(zip(topes_editados['Localidad'], topes_editados['Tope de cupos']))
+
+            df_calor = asignacion.asignar_cupos(
+                df_calor, capacidad,
+                objetivo='umbral' if objetivo_asignacion.startswith('Mas UPZ') else 'brecha',
+                umbral=umbral_cobertura,
+                topes_localidad=topes_localidad
+            )
+            parametros_asignacion = (
+                capacidad, objetivo_asignacion, umbral_cobertura, tuple(sorted(topes_localidad.items()))
+            )
+
+            col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+            with col_m1:
+                st.metric("Cupos asignados", f"{df_calor['CUPOS'].sum():,}")
+            with col_m2:
+                st.metric("UPZ que reciben cupos", f"{(df_calor['CUPOS'] > 0).sum()}")
+            with col_m3:
+                brecha_antes = df_calor['BRECHA_DIN'].clip(lower=0).sum()
+                brecha_despues = df_calor['BRECHA_NUEVA'].clip(lower=0).sum()
+                st.metric("Brecha restante", f"{brecha_despues:,.0f}",
+                          delta=f"{brecha_despues - brecha_antes:,.0f}", delta_color="inverse")
+            with col_m4:
+                sobre_antes = (df_calor['TASA_COB_DIN'] >= umbral_cobertura).sum()
+                sobre_despues = (df_calor['TASA_COB_NUEVA'] >= umbral_cobertura).sum()
+                st.metric(f"UPZ con cobertura >= {umbral_cobertura}%", f"{sobre_despues}",
+                          delta=f"{sobre_despues - sobre_antes:+}")
+
+        # Colores de las clases de estadisticas espaciales
+        colores_hotspot = {
+            'Punto caliente': '#d7191c',
+            'Punto frio': '#2c7bb6',
+            'Alto-Alto': '#d7191c',
+            'Bajo-Bajo': '#2c7bb6',
+            'Alto-Bajo': '#fdae61',
+            'Bajo-Alto': '#abd9e9',
+            'No significativo': '#eeeeee'
+        }
+        es_hotspot = variable_mapa in ["Puntos calientes (Gi*)", "Clusters (Moran local)"]
+        es_asignacion = parametros_asignacion is not None
+
+        if variable_mapa == "Puntos calientes (Gi*)":
+            color_col = 'CLASE_GI'
+            color_label = 'Gi*'
+        elif variable_mapa == "Clusters (Moran local)":
+            color_col = 'CLASE_MORAN'
+            color_label = 'Moran local'
+        elif es_asignacion:
+            color_col = 'CUPOS'
+            color_label = 'Cupos nuevos'
+            # Escala de azules: mas oscuro = mas cupos asignados
+            escala_colores = [[0, '#f7fbff'], [0.3, '#9ecae1'], [0.6, '#4292c6'], [1, '#08306b']]
+            rango = [0, max(int(df_calor['CUPOS'].max()), 1)]
+        elif variable_mapa == "Brecha absoluta":
             color_col = 'BRECHA_DIN'
             color_label = 'Brecha'
             # Escala de rojos: mas rojo = mayor brecha
@@ -782,78 +1365,182 @@ with tab4:
             ]
             rango = [0, min(100, df_calor['TASA_COB_DIN'].max())]
 
-        # Crear GeoJSON con datos de brechas
-        if gdf is not None:
-            geojson_calor = crear_geojson_desde_shapefile(gdf, df_calor)
-        else:
-            geojson_calor = crear_geojson_desde_excel(geo_excel, df_calor)
+        def construir_mapa_calor():
+            """Construye el mapa de zonas calientes; solo se llama si no esta en la cache de figuras"""
+            # Crear GeoJSON con datos de brechas
+            geojson_calor = crear_geojson(hechos, df_calor)
+
+            if not geojson_calor or len(geojson_calor['features']) == 0:
+                return None
 
-        if geojson_calor and len(geojson_calor['features']) > 0:
             # Preparar datos para mapa
-            map_calor = df_calor[['CODIGO_UPZ', 'UPZ', 'LOCALIDAD', 'VULNERABLES_SEL',
-                                   'BENEFICIARIOS_RUTA_CORTA', 'TASA_COB_DIN', 'BRECHA_DIN']].copy()
+            cols_mapa_calor = ['CODIGO_UPZ', 'UPZ', 'LOCALIDAD', 'VULNERABLES_SEL',
+                               'BENEFICIARIOS_RUTA_CORTA', 'TASA_COB_DIN', 'BRECHA_DIN']
+            hover_calor = {
+                'CODIGO_UPZ': False,
+                'LOCALIDAD': True,
+                'VULNERABLES_SEL': ':,',
+                'BENEFICIARIOS_RUTA_CORTA': ':,',
+                'TASA_COB_DIN': True,
+                'BRECHA_DIN': ':,'
+            }
+            if es_hotspot:
+                cols_mapa_calor += [color_col, 'GI_Z', 'GI_P', 'MORAN_I', 'MORAN_P']
+                hover_calor.update({
+                    color_col: False, 'GI_Z': ':.2f', 'GI_P': ':.3f', 'MORAN_I': ':.2f', 'MORAN_P': ':.3f'
+                })
+            if es_asignacion:
+                cols_mapa_calor += ['CUPOS', 'TASA_COB_NUEVA', 'BRECHA_NUEVA']
+            map_calor = df_calor[cols_mapa_calor].copy()
             map_calor['CODIGO_UPZ'] = map_calor['CODIGO_UPZ'].astype(str)
 
             zoom_calor = 11.5 if localidad_sel != 'Todas las localidades' else 10
 
+            if es_hotspot:
+                args_color = dict(color_discrete_map=colores_hotspot)
+            else:
+                args_color = dict(color_continuous_scale=escala_colores, range_color=rango)
+
             fig_calor = px.choropleth_mapbox(
                 map_calor,
                 geojson=geojson_calor,
                 locations='CODIGO_UPZ',
                 featureidkey="id",
                 color=color_col,
-                color_continuous_scale=escala_colores,
-                range_color=rango,
                 hover_name='UPZ',
-                hover_data={
-                    'CODIGO_UPZ': False,
-                    'LOCALIDAD': True,
-                    'VULNERABLES_SEL': ':,',
-                    'BENEFICIARIOS_RUTA_CORTA': ':,',
-                    'TASA_COB_DIN': True,
-                    'BRECHA_DIN': ':,'
-                },
+                hover_data=hover_calor,
                 labels={
                     'VULNERABLES_SEL': f'Vulnerables ({"+".join(grupos_seleccionados)})',
                     'BENEFICIARIOS_RUTA_CORTA': 'Beneficiarios',
                     'TASA_COB_DIN': 'Cobertura %',
                     'BRECHA_DIN': 'Brecha',
-                    'LOCALIDAD': 'Localidad'
+                    'LOCALIDAD': 'Localidad',
+                    'GI_Z': 'Gi* (z)',
+                    'GI_P': 'p Gi*',
+                    'MORAN_I': 'Moran local',
+                    'MORAN_P': 'p Moran',
+                    color_col: color_label
                 },
                 mapbox_style="carto-positron",
                 center={"lat": 4.65, "lon": -74.1},
                 zoom=zoom_calor,
-                opacity=0.8
+                opacity=0.8,
+                **args_color
             )
 
             fig_calor.update_traces(marker_line_width=1.5, marker_line_color='white')
+            if es_asignacion:
+                fig_calor.update_traces(hovertemplate=hover_asignacion(grupos_seleccionados))
 
             # Contornos de localidades
             capas_loc_calor = []
-            if gdf is not None:
-                limites_calor = crear_limites_localidades(gdf, df)
-                if limites_calor:
-                    capas_loc_calor = [{
-                        "source": limites_calor,
-                        "type": "line",
-                        "color": "rgba(0, 0, 0, 0.7)",
-                        "line": {"width": 2.5}
-                    }]
+            limites_calor = crear_limites_localidades(hechos)
+            if limites_calor:
+                capas_loc_calor = [{
+                    "source": limites_calor,
+                    "type": "line",
+                    "color": "rgba(0, 0, 0, 0.7)",
+                    "line": {"width": 2.5}
+                }]
 
             fig_calor.update_layout(
                 height=700,
                 margin=dict(l=0, r=0, t=0, b=0),
                 mapbox=dict(layers=capas_loc_calor),
+                legend_title=color_label,
                 coloraxis_colorbar=dict(
                     title=color_label,
-                    tickformat="," if variable_mapa == "Brecha absoluta" else "",
+                    tickformat="," if variable_mapa in ["Brecha absoluta", "Asignacion de cupos"] else "",
                     len=0.7,
                     thickness=15,
                     x=0.98
                 )
             )
 
-            st.plotly_chart(fig_calor, use_container_width=True)
+            return fig_calor
+
+        # El mapa de zonas calientes no depende del rango de ranking
+        clave_calor = ('calor', tuple(grupos_seleccionados), localidad_sel, parametros_asignacion, variable_mapa)
+        if modo_liviano:
+            detalle_calor = {
+                'VULNERABLES_SEL': f'Vulnerables ({"+".join(grupos_seleccionados)})',
+                'BENEFICIARIOS_RUTA_CORTA': 'Beneficiarios',
+                'TASA_COB_DIN': 'Cobertura %',
+                'BRECHA_DIN': 'Brecha'
+            }
+            if es_hotspot:
+                detalle_calor[color_col] = color_label
+            if es_asignacion:
+                detalle_calor.update({'CUPOS': 'Cupos nuevos', 'TASA_COB_NUEVA': 'Cobertura con cupos %'})
+            mostrar_mapa_liviano(
+                hechos, df_calor, ('calor_liviano',) + clave_calor[1:],
+                detalle=detalle_calor,
+                altura=700,
+                color_col=color_col,
+                escala=None if es_hotspot else escala_colores,
+                rango=None if es_hotspot else rango,
+                titulo=color_label,
+                colores_categoria=colores_hotspot if es_hotspot else None
+            )
+            mapa_disponible = True
+        else:
+            if es_asignacion:
+                # La figura base no depende de la capacidad: se cachea sin los
+                # parametros y en cada rerun solo se cambian color y hover
+                fig_calor = obtener_figura(clave_calor[:3] + (None, variable_mapa), construir_mapa_calor)
+                if fig_calor is not None:
+                    fig_base = json.loads(fig_calor)
+                    actualizar_mapa_asignacion(fig_base, df_calor)
+                    fig_calor = json.dumps(fig_base)
+            else:
+                fig_calor = obtener_figura(clave_calor, construir_mapa_calor)
+            mapa_disponible = fig_calor is not None
+            if mapa_disponible:
+                mostrar_figura(fig_calor, altura=700)
+
+        if mapa_disponible and es_hotspot:
+            st.caption(
+                "Clases significativas al 5% segun 999 permutaciones condicionales sobre la "
+                "brecha de toda la ciudad (vecindad tipo reina entre UPZ)."
+            )
+            significativas = df_calor[df_calor[color_col] != 'No significativo']
+            significativas = significativas.sort_values('BRECHA_DIN', ascending=False)
+            tabla_hotspot = significativas[['UPZ', 'LOCALIDAD', 'BRECHA_DIN', color_col, 'GI_Z', 'GI_P', 'MORAN_I', 'MORAN_P']].copy()
+            tabla_hotspot.columns = ['UPZ', 'Localidad', 'Brecha', 'Clase', 'Gi* (z)', 'p Gi*', 'Moran local', 'p Moran']
+            st.dataframe(
+                tabla_hotspot.style.format({
+                    'Brecha': '{:,.0f}', 'Gi* (z)': '{:.2f}', 'p Gi*': '{:.3f}',
+                    'Moran local': '{:.2f}', 'p Moran': '{:.3f}'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        if mapa_disponible and es_asignacion:
+            st.caption(
+                "Ninguna UPZ recibe mas cupos que su brecha. 'Reducir la brecha ponderada' da prioridad "
+                "a las UPZ con menor cobertura; 'Mas UPZ sobre un umbral' cubre primero las UPZ que "
+                "necesitan menos cupos para llegar al umbral y reparte el resto por menor cobertura."
+            )
+            asignadas = df_calor[df_calor['CUPOS'] > 0].sort_values('CUPOS', ascending=False)
+            tabla_cupos = asignadas[['CODIGO_UPZ', 'UPZ', 'LOCALIDAD', 'BRECHA_DIN', 'TASA_COB_DIN',
+                                     'CUPOS', 'TASA_COB_NUEVA', 'BRECHA_NUEVA']].copy()
+            tabla_cupos.columns = ['Codigo UPZ', 'UPZ', 'Localidad', 'Brecha', 'Cobertura %',
+                                   'Cupos nuevos', 'Cobertura con cupos %', 'Brecha con cupos']
+            st.dataframe(
+                tabla_cupos.style.format({
+                    'Brecha': '{:,.0f}', 'Cobertura %': '{:.1f}%', 'Cupos nuevos': '{:,.0f}',
+                    'Cobertura con cupos %': '{:.1f}%', 'Brecha con cupos': '{:,.0f}'
+                }).background_gradient(subset=['Cupos nuevos'], cmap='Blues'),
+                width='stretch',
+                hide_index=True
+            )
+            st.download_button(
+                "Descargar asignacion (CSV)",
+                tabla_cupos.to_csv(index=False).encode('utf-8'),
+                file_name=f"asignacion_cupos_{'+'.join(grupos_seleccionados)}.csv",
+                mime='text/csv'
+            )
 
         # Resumen por localidad en zonas calientes
         st.markdown("#### Brechas agregadas por localidad")
@@ -906,6 +1593,313 @@ with tab4:
     else:
         st.warning("Se necesitan los datos de brechas y geodatos para este mapa")
 
+# ============================================
+# TAB 5: COMPARAR ESCENARIOS
+# ============================================
+with tab5:
+    st.markdown("### Comparacion de escenarios")
+    st.markdown("""
+    Compara el ranking de las UPZ entre combinaciones de grupos SISBEN: que UPZ
+    suben o bajan al pasar de un escenario a otro. Los rankings son de toda la
+    ciudad; el filtro de localidad solo limita las UPZ que se muestran.
+    """)
+
+    poblacion_esc, ranking_esc = calcular_rankings_escenarios(hechos)
+    opciones_escenario = list(ranking_esc.columns)
+    escenario_actual = '+'.join(grupos_seleccionados)
+
+    # UPZ visibles segun el filtro de localidad
+    visibles = hechos.index
+    if localidad_sel != 'Todas las localidades':
+        visibles = hechos.index[hechos['LOCALIDAD'] == localidad_sel]
+
+    modo_comparacion = st.radio(
+        "Comparar:",
+        ["Dos escenarios", "Todas las combinaciones"],
+        horizontal=True
+    )
+
+    if modo_comparacion == "Dos escenarios":
+        col_e1, col_e2 = st.columns(2)
+        with col_e1:
+            escenario_base = st.selectbox(
+                "Escenario base", opciones_escenario,
+                index=opciones_escenario.index(escenario_actual)
+            )
+        with col_e2:
+            escenario_comp = st.selectbox(
+                "Escenario a comparar", opciones_escenario,
+                index=opciones_escenario.index('A' if escenario_actual != 'A' else 'A+B+C')
+            )
+
+        df_comp = comparar_escenarios(hechos, poblacion_esc, ranking_esc, escenario_base, escenario_comp)
+        df_comp = df_comp.loc[visibles]
+
+        col_c1, col_c2, col_c3, col_c4 = st.columns(4)
+        with col_c1:
+            st.metric("UPZ que suben", f"{(df_comp['DELTA_RANKING'] > 0).sum()}")
+        with col_c2:
+            st.metric("UPZ que bajan", f"{(df_comp['DELTA_RANKING'] < 0).sum()}")
+        with col_c3:
+            st.metric("Mayor subida", f"{df_comp['DELTA_RANKING'].max():+,}")
+        with col_c4:
+            st.metric("Mayor caida", f"{df_comp['DELTA_RANKING'].min():+,}")
+
+        col_s1, col_s2 = st.columns(2)
+
+        with col_s1:
+            # Grafico de pendiente: UPZ que estan entre las 20 primeras en algun escenario
+            top_pendiente = df_comp[
+                (df_comp['RANKING_BASE'] <= 20) | (df_comp['RANKING_COMP'] <= 20)
+            ]
+            if localidad_sel != 'Todas las localidades':
+                top_pendiente = df_comp
+            fig_pendiente = go.Figure()
+            for _, upz in top_pendiente.iterrows():
+                color = '#1a9850' if upz['DELTA_RANKING'] > 0 else ('#d73027' if upz['DELTA_RANKING'] < 0 else '#999999')
+                fig_pendiente.add_trace(go.Scatter(
+                    x=[escenario_base, escenario_comp],
+                    y=[upz['RANKING_BASE'], upz['RANKING_COMP']],
+                    mode='lines+markers+text',
+                    line=dict(color=color, width=2),
+                    text=['', upz['UPZ']],
+                    textposition='middle right',
+                    textfont=dict(size=9),
+                    name=upz['UPZ'],
+                    hovertemplate=f"{upz['UPZ']}<br>%{{x}}: puesto %{{y}}<extra></extra>"
+                ))
+            fig_pendiente.update_layout(
+                title=f'Cambio de puesto: {escenario_base} -> {escenario_comp}',
+                height=650,
+                showlegend=False,
+                yaxis=dict(autorange='reversed', title='Ranking'),
+                xaxis=dict(title='', range=[-0.2, 1.6]),
+                margin=dict(l=10, r=10, t=50, b=10)
+            )
+            st.plotly_chart(fig_pendiente, width='stretch')
+
+        with col_s2:
+            # Mapa del cambio de ranking (verde = sube, rojo = baja)
+            max_delta = max(int(df_comp['DELTA_RANKING'].abs().max()), 1)
+            escala_delta = [[0, '#d73027'], [0.5, '#f7f7f7'], [1, '#1a9850']]
+            clave_comp = ('comparacion', (escenario_base, escenario_comp), localidad_sel, None, 'DELTA_RANKING')
+
+            if modo_liviano and origen_geometria is not None:
+                mostrar_mapa_liviano(
+                    hechos, df_comp, ('comparacion_liviano',) + clave_comp[1:],
+                    detalle={
+                        'RANKING_BASE': f'Ranking {escenario_base}',
+                        'RANKING_COMP': f'Ranking {escenario_comp}',
+                        'DELTA_RANKING': 'Cambio de puesto',
+                        'DELTA_POB': 'Cambio de poblacion'
+                    },
+                    color_col='DELTA_RANKING',
+                    escala=escala_delta,
+                    rango=[-max_delta, max_delta],
+                    titulo='Cambio de puesto'
+                )
+            else:
+                def construir_mapa_comparacion():
+                    """Construye el mapa de cambio de ranking; solo se llama si no esta en la cache de figuras"""
+                    if origen_geometria is None:
+                        return None
+                    geojson_comp = crear_geojson(hechos, df_comp)
+                    if not geojson_comp or len(geojson_comp['features']) == 0:
+                        return None
+
+                    map_comp = df_comp.copy()
+                    map_comp['CODIGO_UPZ'] = map_comp['CODIGO_UPZ'].astype(str)
+                    fig_comp = px.choropleth_mapbox(
+                        map_comp,
+                        geojson=geojson_comp,
+                        locations='CODIGO_UPZ',
+                        featureidkey="id",
+                        color='DELTA_RANKING',
+                        color_continuous_scale=escala_delta,
+                        range_color=[-max_delta, max_delta],
+                        hover_name='UPZ',
+                        hover_data={
+                            'CODIGO_UPZ': False,
+                            'LOCALIDAD': True,
+                            'RANKING_BASE': True,
+                            'RANKING_COMP': True,
+                            'DELTA_RANKING': ':+',
+                            'POB_BASE': ':,',
+                            'POB_COMP': ':,',
+                            'DELTA_POB': ':+,'
+                        },
+                        labels={
+                            'LOCALIDAD': 'Localidad',
+                            'RANKING_BASE': f'Ranking {escenario_base}',
+                            'RANKING_COMP': f'Ranking {escenario_comp}',
+                            'DELTA_RANKING': 'Cambio de puesto',
+                            'POB_BASE': f'Poblacion {escenario_base}',
+                            'POB_COMP': f'Poblacion {escenario_comp}',
+                            'DELTA_POB': 'Cambio de poblacion'
+                        },
+                        mapbox_style="carto-positron",
+                        center={"lat": 4.65, "lon": -74.1},
+                        zoom=11.5 if localidad_sel != 'Todas las localidades' else 10,
+                        opacity=0.8
+                    )
+                    fig_comp.update_traces(marker_line_width=1, marker_line_color='white')
+                    fig_comp.update_layout(
+                        height=650,
+                        margin=dict(l=0, r=0, t=0, b=0),
+                        coloraxis_colorbar=dict(title="Cambio<br>de puesto", len=0.7, thickness=15, x=0.98)
+                    )
+                    return fig_comp
+
+                fig_comp = obtener_figura(clave_comp, construir_mapa_comparacion)
+                if fig_comp is not None:
+                    mostrar_figura(fig_comp, altura=650)
+
+        st.markdown("#### Cambios por UPZ")
+        tabla_comp = df_comp.sort_values('DELTA_RANKING', ascending=False)[[
+            'UPZ', 'LOCALIDAD', 'RANKING_BASE', 'RANKING_COMP', 'DELTA_RANKING', 'POB_BASE', 'POB_COMP', 'DELTA_POB'
+        ]].copy()
+        tabla_comp.columns = [
+            'UPZ', 'Localidad', f'Ranking {escenario_base}', f'Ranking {escenario_comp}', 'Cambio de puesto',
+            f'Poblacion {escenario_base}', f'Poblacion {escenario_comp}', 'Cambio de poblacion'
+        ]
+        st.dataframe(
+            tabla_comp.style.format({
+                'Cambio de puesto': '{:+,}',
+                f'Poblacion {escenario_base}': '{:,.0f}',
+                f'Poblacion {escenario_comp}': '{:,.0f}',
+                'Cambio de poblacion': '{:+,.0f}'
+            }).background_gradient(subset=['Cambio de puesto'], cmap='RdYlGn', vmin=-max_delta, vmax=max_delta),
+            width='stretch',
+            hide_index=True,
+            height=500
+        )
+    else:
+        # Grafico de posiciones (bump chart) en las 15 combinaciones
+        n_top = 15
+        ranking_vista = ranking_esc.loc[visibles]
+        top_upz = ranking_vista[escenario_actual].nsmallest(n_top).index
+
+        fig_bump = go.Figure()
+        for idx in top_upz:
+            fig_bump.add_trace(go.Scatter(
+                x=opciones_escenario,
+                y=ranking_esc.loc[idx].to_numpy(),
+                mode='lines+markers',
+                name=hechos.at[idx, 'UPZ'],
+                hovertemplate=f"{hechos.at[idx, 'UPZ']}<br>%{{x}}: puesto %{{y}}<extra></extra>"
+            ))
+        fig_bump.update_layout(
+            title=f'Puesto de las {n_top} primeras UPZ de {escenario_actual} en cada combinacion',
+            height=600,
+            yaxis=dict(autorange='reversed', title='Ranking'),
+            xaxis=dict(title='Combinacion de grupos'),
+            legend=dict(font=dict(size=9))
+        )
+        st.plotly_chart(fig_bump, width='stretch')
+
+        st.markdown("#### Ranking por combinacion de grupos")
+        tabla_esc = pd.concat([hechos.loc[visibles, ['UPZ', 'LOCALIDAD']], ranking_vista], axis=1)
+        tabla_esc = tabla_esc.sort_values(escenario_actual)
+        tabla_esc = tabla_esc.rename(columns={'LOCALIDAD': 'Localidad'})
+        st.dataframe(
+            tabla_esc.style.background_gradient(subset=opciones_escenario, cmap='YlOrRd_r', vmin=1, vmax=len(hechos)),
+            width='stretch',
+            hide_index=True,
+            height=500
+        )
+
+# ============================================
+# TAB 6: UBICAR COORDENADAS
+# ============================================
+with tab6:
+    st.markdown("### Ubicar coordenadas en UPZ")
+    st.markdown("""
+    Sube un CSV con puntos (longitud y latitud en WGS84, como las da un GPS o
+    Google Maps) y descarga el mismo archivo con la UPZ, la localidad, el ranking
+    y la brecha de cada punto segun los grupos SISBEN seleccionados.
+    """)
+
+    if origen_geometria is None:
+        st.warning("Se necesitan los geodatos de las UPZ para ubicar coordenadas")
+    else:
+        archivo_puntos = st.file_uploader("Archivo CSV de coordenadas", type=['csv', 'txt'])
+        if archivo_puntos is not None:
+            contenido_puntos = archivo_puntos.getvalue()
+            try:
+                df_puntos = leer_coordenadas(contenido_puntos)
+            except Exception as e:
+                st.error(f"No se pudo leer el archivo: {e}")
+                df_puntos = None
+
+            if df_puntos is not None:
+                columnas_puntos = list(df_puntos.columns)
+                col_u1, col_u2 = st.columns(2)
+                with col_u1:
+                    sugerida = columna_por_nombre(columnas_puntos, NOMBRES_LONGITUD)
+                    col_lon = st.selectbox(
+                        "Columna de longitud", columnas_puntos,
+                        index=columnas_puntos.index(sugerida) if sugerida is not None else 0
+                    )
+                with col_u2:
+                    sugerida = columna_por_nombre(columnas_puntos, NOMBRES_LATITUD)
+                    col_lat = st.selectbox(
+                        "Columna de latitud", columnas_puntos,
+                        index=columnas_puntos.index(sugerida) if sugerida is not None else min(1, len(columnas_puntos) - 1)
+                    )
+
+                inicio_ubicacion = time.perf_counter()
+                df_ubicados, csv_ubicados = enriquecer_coordenadas(
+                    hechos, contenido_puntos, col_lon, col_lat, tuple(grupos_seleccionados)
+                )
+                segundos_ubicacion = time.perf_counter() - inicio_ubicacion
+
+                ubicados = df_ubicados['CODIGO_UPZ'].notna()
+                col_p1, col_p2, col_p3 = st.columns(3)
+                with col_p1:
+                    st.metric("Puntos", f"{len(df_ubicados):,}")
+                with col_p2:
+                    st.metric("Ubicados en una UPZ", f"{ubicados.sum():,}")
+                with col_p3:
+                    st.metric("Fuera de las UPZ o sin coordenadas", f"{(~ubicados).sum():,}")
+                st.caption(f"Resuelto en {segundos_ubicacion:.2f} s")
+
+                st.download_button(
+                    "Descargar CSV con UPZ",
+                    csv_ubicados,
+                    file_name=f"{os.path.splitext(archivo_puntos.name)[0]}_upz.csv",
+                    mime='text/csv'
+                )
+
+                col_r1, col_r2 = st.columns(2)
+                with col_r1:
+                    st.markdown("#### Puntos por UPZ")
+                    conteo_upz = (
+                        df_ubicados[ubicados]
+                        .groupby(['UPZ', 'LOCALIDAD', 'RANKING_DINAMICO'], observed=True)
+                        .size().rename('PUNTOS').reset_index()
+                        .sort_values('PUNTOS', ascending=False)
+                    )
+                    conteo_upz.columns = ['UPZ', 'Localidad', 'Ranking', 'Puntos']
+                    st.dataframe(conteo_upz, width='stretch', hide_index=True, height=400)
+                with col_r2:
+                    st.markdown("#### Vista previa")
+                    st.dataframe(df_ubicados.head(1000), width='stretch', hide_index=True, height=400)
+
+# Estado de las caches de mapas (al final para incluir los mapas de este rerun)
+with st.sidebar.expander("Cache de mapas"):
+    st.caption(
+        f"Servidor listo desde {estado_servidor['inicio']} "
+        f"(arranque en {estado_servidor['segundos']:.1f} s)"
+    )
+    for nombre_cache, cache_mapas in [("Figuras", obtener_cache_figuras()), ("Imagenes", obtener_cache_imagenes())]:
+        stats_cache = cache_mapas.estadisticas()
+        st.caption(
+            f"**{nombre_cache}** - Aciertos: {stats_cache['aciertos']:,} | Fallos: {stats_cache['fallos']:,}<br>"
+            f"Elementos: {stats_cache['figuras']} | "
+            f"{stats_cache['bytes'] / 1024 ** 2:,.1f} de {stats_cache['max_bytes'] / 1024 ** 2:,.0f} MB",
+            unsafe_allow_html=True
+        )
+
 # ============================================
 # FOOTER
 # ============================================
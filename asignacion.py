@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Asignacion de cupos de ruta corta del Tablero JCO
+
+Reparte nuevos cupos entre UPZ segun su brecha, con topes opcionales por
+localidad, sin dependencias de Streamlit para poder probarla por separado.
+app.py la usa en la vista de zonas calientes (color por asignacion de cupos).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _repartir_en_orden(necesidad, localidad, topes, capacidad):
+    """
+    Reparte la capacidad en el orden dado: cada UPZ recibe hasta su necesidad
+    sin pasar el tope de su localidad ni la capacidad restante
+
+    Equivale a recorrer las UPZ una por una, pero con sumas acumuladas.
+
+    Args:
+        necesidad: cupos que puede recibir cada UPZ, ya ordenados por prioridad
+        localidad: codigo entero de la localidad de cada UPZ
+        topes: cupos maximos por codigo de localidad (np.inf = sin tope)
+        capacidad: cupos disponibles
+    """
+    previo_localidad = pd.Series(necesidad).groupby(localidad).cumsum().to_numpy() - necesidad
+    dentro_tope = np.clip(topes[localidad] - previo_localidad, 0, necesidad)
+    previo = np.cumsum(dentro_tope) - dentro_tope
+    return np.clip(capacidad - previo, 0, dentro_tope)
+
+
+def asignar_cupos(df_brecha, capacidad, objetivo='brecha', umbral=50, topes_localidad=None):
+    """
+    Distribuye nuevos cupos de ruta corta entre las UPZ
+
+    Objetivos:
+        'brecha': minimiza la brecha ponderada por la proporcion sin cubrir
+            (1 - cobertura); los cupos van primero a las UPZ con menor cobertura.
+        'umbral': maximiza el numero de UPZ con cobertura >= umbral, cubriendo
+            primero las que necesitan menos cupos; lo que sobra se reparte como
+            en 'brecha'.
+    Ninguna UPZ recibe mas cupos que su brecha. Con pesos constantes y topes
+    por localidad el reparto voraz es optimo, y se resuelve sin recorrer filas.
+
+    Args:
+        df_brecha: Resultado de calcular_brecha_dinamica
+        capacidad: Numero de cupos a repartir
+        objetivo: 'brecha' o 'umbral'
+        umbral: Cobertura objetivo en % (objetivo 'umbral')
+        topes_localidad: dict localidad -> cupos maximos (las ausentes no tienen tope)
+
+    Returns:
+        Copia de df_brecha con CUPOS, BENEFICIARIOS_NUEVO, TASA_COB_NUEVA y BRECHA_NUEVA
+    """
+    df_asig = df_brecha.copy()
+    brecha = df_asig['BRECHA_DIN'].clip(lower=0).to_numpy(dtype=float)
+    vulnerables = df_asig['VULNERABLES_SEL'].to_numpy(dtype=float)
+    beneficiarios = df_asig['BENEFICIARIOS_RUTA_CORTA'].to_numpy(dtype=float)
+    peso = np.where(vulnerables > 0, brecha / np.where(vulnerables > 0, vulnerables, 1), 0)
+
+    localidad, nombres = pd.factorize(df_asig['LOCALIDAD'])
+    topes = np.array([(topes_localidad or {}).get(n, np.inf) for n in nombres], dtype=float)
+    cupos = np.zeros(len(df_asig))
+
+    if objetivo == 'umbral':
+        # Cupos que faltan para llegar al umbral; las que ya lo superan no necesitan
+        requeridos = np.maximum(np.ceil(umbral / 100 * vulnerables - beneficiarios), 0)
+        orden = np.lexsort((-peso, requeridos))
+        orden = orden[requeridos[orden] > 0]
+        req = requeridos[orden]
+        loc = localidad[orden]
+        # Una UPZ se financia completa o no se financia
+        acumulado_localidad = pd.Series(req).groupby(loc).cumsum().to_numpy()
+        elegible = acumulado_localidad <= topes[loc]
+        financiada = elegible & (np.cumsum(np.where(elegible, req, 0)) <= capacidad)
+        cupos[orden[financiada]] = req[financiada]
+
+    # Capacidad restante: por proporcion sin cubrir, sin pasar la brecha ni los topes
+    restante = capacidad - cupos.sum()
+    if restante > 0:
+        usados = np.bincount(localidad, weights=cupos, minlength=len(nombres))
+        orden = np.lexsort((-brecha, -peso))
+        cupos[orden] += _repartir_en_orden(
+            (brecha - cupos)[orden], localidad[orden], topes - usados, restante
+        )
+
+    df_asig['CUPOS'] = cupos.astype(int)
+    df_asig['BENEFICIARIOS_NUEVO'] = df_asig['BENEFICIARIOS_RUTA_CORTA'] + df_asig['CUPOS']
+    df_asig['TASA_COB_NUEVA'] = (df_asig['BENEFICIARIOS_NUEVO'] / df_asig['VULNERABLES_SEL'] * 100).round(1)
+    df_asig.loc[df_asig['VULNERABLES_SEL'] == 0, 'TASA_COB_NUEVA'] = 0
+    df_asig['BRECHA_NUEVA'] = df_asig['VULNERABLES_SEL'] - df_asig['BENEFICIARIOS_NUEVO']
+    return df_asig
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Cache en memoria de figuras del Tablero JCO
+
+LRU por bytes, segura entre hilos y sin dependencias de Streamlit para poder
+probarla por separado. app.py crea una instancia por proceso (st.cache_resource)
+para las figuras Plotly y otra para las imagenes del modo liviano.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class CacheFiguras:
+    """
+    Cache LRU de figuras Plotly serializadas, compartida entre sesiones
+
+    Guarda el JSON de cada figura en bytes y descarta las menos usadas
+    cuando el total supera max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            datos = self._figuras.get(clave)
+            if datos is None:
+                self.fallos += 1
+                return None
+            self._figuras.move_to_end(clave)
+            self.aciertos += 1
+            return datos
+
+    def guardar(self, clave, datos):
+        # Una figura mas grande que toda la cache no se guarda
+        if len(datos) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._figuras.pop(clave, None)
+            if anterior is not None:
+                self.total_bytes -= len(anterior)
+            self._figuras[clave] = datos
+            self.total_bytes += len(datos)
+            while self.total_bytes > self.max_bytes:
+                _, descartada = self._figuras.popitem(last=False)
+                self.total_bytes -= len(descartada)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'figuras': len(self._figuras),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Ubicacion de puntos en UPZ del Tablero JCO
+
+Indice STRtree sobre los poligonos de UPZ y punto-en-poligono en bloque, sin
+dependencias de Streamlit para poder probarlo por separado. app.py cachea el
+indice por proceso y lo usa en la vista de ubicar coordenadas.
+"""
+
+import numpy as np
+import shapely
+
+
+def construir_indice(hechos):
+    """
+    Indice STRtree sobre los poligonos de UPZ
+
+    Los poligonos quedan preparados para que el punto-en-poligono no recorra
+    todos los vertices en cada consulta.
+
+    Args:
+        hechos: GeoDataFrame indexado por IDX_UPZ (las filas sin geometria se omiten)
+
+    Returns:
+        Tupla (STRtree, poligonos preparados, IDX_UPZ de cada poligono del arbol)
+    """
+    con_geometria = hechos.geometry.notna().to_numpy()
+    poligonos = np.asarray(hechos.geometry.values[con_geometria])
+    shapely.prepare(poligonos)
+    return shapely.STRtree(poligonos), poligonos, hechos.index.to_numpy()[con_geometria]
+
+
+def ubicar_puntos(indice, lon, lat):
+    """
+    UPZ que contiene cada punto, resuelto en bloque sobre el indice espacial
+
+    Args:
+        indice: Resultado de construir_indice
+        lon, lat: Arreglos de coordenadas en WGS84 (NaN = sin coordenada)
+
+    Returns:
+        Arreglo con el IDX_UPZ de cada punto (-1 si no cae en ninguna UPZ)
+    """
+    arbol, poligonos, posiciones = indice
+    # Candidatos por caja envolvente en el arbol y luego punto-en-poligono
+    # vectorizado (equivale a predicate='within', pero sobre poligonos preparados)
+    idx_punto, idx_arbol = arbol.query(shapely.points(lon, lat))
+    dentro = shapely.contains_xy(poligonos[idx_arbol], lon[idx_punto], lat[idx_punto])
+    idx_punto, idx_arbol = idx_punto[dentro], idx_arbol[dentro]
+
+    # Si hay poligonos superpuestos, el punto queda en la primera UPZ de la
+    # tabla (el arbol no devuelve los candidatos en ese orden)
+    orden = np.lexsort((idx_arbol, idx_punto))
+    idx_punto, idx_arbol = idx_punto[orden], idx_arbol[orden]
+    resultado = np.full(len(lon), -1)
+    unicos, primero = np.unique(idx_punto, return_index=True)
+    resultado[unicos] = posiciones[idx_arbol[primero]]
+    return resultado
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Estadisticas espaciales locales del Tablero JCO
+
+Gi* de Getis-Ord e I de Moran local sobre una matriz dispersa de vecindad, sin
+dependencias de Streamlit para poder probarlas por separado. app.py construye
+la matriz de vecindad y clasifica los resultados en la vista de zonas calientes.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def estadisticas_locales(valores, w, permutaciones=999, semilla=12345):
+    """
+    Calcula Gi* de Getis-Ord y el I de Moran local con p-valores por permutacion
+
+    Las permutaciones son condicionales (el valor de cada UPZ queda fijo y se
+    sortean sus vecinos) y se resuelven todas a la vez con arreglos de numpy.
+
+    Args:
+        valores: Arreglo con la variable a analizar, en el orden de la matriz
+        w: Matriz binaria CSR de vecindad
+        permutaciones: Numero de permutaciones aleatorias
+        semilla: Semilla del generador para resultados reproducibles
+
+    Returns:
+        DataFrame con GI_Z, GI_P, MORAN_I y MORAN_P por UPZ
+    """
+    x = np.asarray(valores, dtype=float)
+    n = len(x)
+    vecinos = np.diff(w.indptr)
+    k_div = np.maximum(vecinos, 1)
+
+    # Moran local con pesos estandarizados por fila
+    z = (x - x.mean()) / (x.std() or 1.0)
+    rezago = (w @ z) / k_div
+    moran = z * rezago
+
+    # Gi*: pesos binarios que incluyen a la propia UPZ
+    wi = vecinos + 1.0
+    x_media = x.mean()
+    s = x.std() or 1.0
+    denominador = s * np.sqrt((n * wi - wi ** 2) / (n - 1))
+    gi = ((w @ x) + x - x_media * wi) / denominador
+
+    # Indices aleatorios compartidos por todas las UPZ; para cada UPZ se corren
+    # en uno los indices >= i para excluirla de sus propios vecinos sorteados
+    kmax = max(int(vecinos.max()), 1)
+    rng = np.random.default_rng(semilla)
+    ids = rng.random((permutaciones, n - 1)).argsort(axis=1)[:, :kmax]
+    idx = ids[None, :, :] + (ids[None, :, :] >= np.arange(n)[:, None, None])
+    activos = (np.arange(kmax)[None, :] < vecinos[:, None])[:, None, :]
+
+    suma_x = (x[idx] * activos).sum(axis=2)
+    suma_z = (z[idx] * activos).sum(axis=2)
+    moran_sim = z[:, None] * suma_z / k_div[:, None]
+    gi_sim = (suma_x + x[:, None] - x_media * wi[:, None]) / denominador[:, None]
+
+    def p_valor(obs, sim):
+        mayores = (sim >= obs[:, None]).sum(axis=1)
+        mayores = np.minimum(mayores, permutaciones - mayores)
+        return (mayores + 1) / (permutaciones + 1)
+
+    # Sin vecinos todas las permutaciones coinciden con lo observado; una UPZ
+    # aislada no puede ser significativa
+    p_gi = p_valor(gi, gi_sim)
+    p_moran = p_valor(moran, moran_sim)
+    p_gi[vecinos == 0] = 1.0
+    p_moran[vecinos == 0] = 1.0
+
+    return pd.DataFrame({
+        'GI_Z': gi,
+        'GI_P': p_gi,
+        'MORAN_I': moran,
+        'MORAN_P': p_moran,
+        'Z': z,
+        'REZAGO': rezago,
+    })
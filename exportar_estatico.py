@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+Exportacion estatica del Tablero JCO
+
+Pre-renderiza todos los escenarios del tablero (combinaciones de grupos SISBEN x
+localidad x variable del mapa de zonas calientes) ejecutando app.py con el API de
+pruebas de Streamlit, y guarda mapas, tablas y metricas como un paquete de HTML y
+JSON que se puede servir con cualquier servidor HTTP estatico:
+
+    python exportar_estatico.py --salida estatico --procesos 4
+    python -m http.server 8000 --directory estatico
+
+El rango de ranking queda fijo en el valor por defecto del tablero; para rangos
+personalizados se sigue usando la app de Streamlit.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly.offline
+from streamlit.testing.v1 import AppTest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(SCRIPT_DIR, 'app.py')
+
+GRUPOS = ['A', 'B', 'C', 'D']
+ETIQUETA_VARIABLE = "Colorear el mapa por:"
+ETIQUETA_LOCALIDAD = "Localidad"
+ETIQUETA_RANGO = "Seleccionar rango"
+ETIQUETA_ZONAS = "Zonas calientes"
+# Pestanas que dependen de archivos subidos por el usuario y no se exportan
+PESTANAS_SIN_EXPORTAR = ["Ubicar coordenadas"]
+TIMEOUT_APP = 300
+
+# Referencias que reemplazan las geometrias repetidas dentro de cada figura
+REF_GEOMETRIAS = '@geometrias'
+REF_LOCALIDADES = '@localidades'
+
+# Estado de cada proceso del pool
+_app = None
+_directorio_escenarios = None
+_geometrias_enviadas = set()
+
+
+def combinaciones_grupos():
+    """Las 15 combinaciones no vacias de grupos SISBEN, en orden A-D"""
+    combinaciones = []
+    for n in range(1, len(GRUPOS) + 1):
+        combinaciones.extend(list(c) for c in itertools.combinations(GRUPOS, n))
+    return combinaciones
+
+
+def slug(texto):
+    """Convierte un texto en un identificador apto para nombres de archivo"""
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-')
+
+
+def id_escenario(grupos, localidad):
+    return f"{''.join(grupos)}__{slug(localidad)}"
+
+
+def _crear_app():
+    logging.disable(logging.WARNING)
+    app = AppTest.from_file(APP_FILE, default_timeout=TIMEOUT_APP)
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"app.py fallo al iniciar: {app.exception[0].value}")
+    return app
+
+
+def _widget(elementos, etiqueta):
+    for elemento in elementos:
+        if elemento.label == etiqueta:
+            return elemento
+    raise KeyError(f"No se encontro el control '{etiqueta}' en app.py")
+
+
+def _pestanas_exportables(app):
+    return [t for t in app.tabs if t.label not in PESTANAS_SIN_EXPORTAR]
+
+
+def _indice_pestana(pestanas, etiqueta):
+    for i, pestana in enumerate(pestanas):
+        if pestana.label == etiqueta:
+            return i
+    raise KeyError(f"No se encontro la pestana '{etiqueta}' en app.py")
+
+
+def _separar_geometrias(spec, geometrias, capas):
+    """
+    Saca de la figura el GeoJSON de UPZ y los contornos de localidades, que se
+    repiten en todos los escenarios, y los deja como referencias compartidas
+    """
+    for traza in spec.get('data', []):
+        geojson = traza.get('geojson')
+        if isinstance(geojson, dict):
+            for feature in geojson.get('features', []):
+                geometrias.setdefault(feature['id'], {
+                    'type': 'Feature', 'id': feature['id'], 'geometry': feature['geometry']
+                })
+            traza['geojson'] = REF_GEOMETRIAS
+
+    for capa in spec.get('layout', {}).get('mapbox', {}).get('layers', []):
+        if isinstance(capa.get('source'), dict):
+            capas.setdefault(REF_LOCALIDADES, capa['source'])
+            capa['source'] = REF_LOCALIDADES
+    return spec
+
+
+def _contenido(bloque, geometrias, capas):
+    """Metricas, figuras y tablas de un bloque (pestana) del arbol de elementos"""
+    return {
+        'metricas': [{'etiqueta': m.label, 'valor': m.value} for m in bloque.metric],
+        'figuras': [
+            _separar_geometrias(json.loads(p.proto.spec), geometrias, capas)
+            for p in bloque.get('plotly_chart')
+        ],
+        'tablas': [
+            json.loads(d.value.to_json(orient='split', index=False))
+            for d in bloque.dataframe
+        ],
+    }
+
+
+def _iniciar_worker(directorio_escenarios):
+    global _app, _directorio_escenarios
+    _app = _crear_app()
+    _directorio_escenarios = directorio_escenarios
+
+
+def renderizar_escenario(grupos, localidad):
+    """
+    Ejecuta app.py con los grupos y la localidad dados y guarda el JSON del
+    escenario, con una variante de la pestana de zonas calientes por variable
+
+    Returns:
+        Tupla (id del escenario, geometrias nuevas, capas compartidas)
+    """
+    app = _app
+    for g in GRUPOS:
+        _widget(app.checkbox, f"Grupo {g}").set_value(g in grupos)
+    _widget(app.selectbox, ETIQUETA_LOCALIDAD).set_value(localidad)
+    selector = _widget(app.radio, ETIQUETA_VARIABLE)
+    variables = list(selector.options)
+    selector.set_value(variables[0])
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"{grupos} / {localidad}: {app.exception[0].value}")
+
+    # La pestana de zonas calientes se guarda aparte, una variante por variable
+    exportables = _pestanas_exportables(app)
+    pestana_zonas = _indice_pestana(exportables, ETIQUETA_ZONAS)
+    geometrias, capas = {}, {}
+    pestanas = [None if i == pestana_zonas else _contenido(t, geometrias, capas)
+                for i, t in enumerate(exportables)]
+
+    # Las metricas generales son las que no estan dentro de ninguna pestana
+    n_metricas_pestanas = sum(len(t.metric) for t in app.tabs)
+    metricas = list(app.main.metric)
+    resumen = [{'etiqueta': m.label, 'valor': m.value}
+               for m in metricas[:len(metricas) - n_metricas_pestanas]]
+
+    zonas_calientes = {variables[0]: _contenido(exportables[pestana_zonas], geometrias, capas)}
+    for variable in variables[1:]:
+        _widget(app.radio, ETIQUETA_VARIABLE).set_value(variable)
+        app.run()
+        zonas_calientes[variable] = _contenido(_pestanas_exportables(app)[pestana_zonas], geometrias, capas)
+
+    escenario = id_escenario(grupos, localidad)
+    datos = {
+        'id': escenario,
+        'grupos': grupos,
+        'localidad': localidad,
+        'rango': list(_widget(app.slider, ETIQUETA_RANGO).value),
+        'resumen': resumen,
+        'pestanas': pestanas,
+        'zonas_calientes': zonas_calientes,
+    }
+    with open(os.path.join(_directorio_escenarios, f'{escenario}.json'), 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, separators=(',', ':'))
+
+    # Cada proceso envia cada geometria una sola vez al proceso principal
+    nuevas = {k: v for k, v in geometrias.items() if k not in _geometrias_enviadas}
+    _geometrias_enviadas.update(nuevas)
+    return escenario, nuevas, capas
+
+
+def exportar(salida, procesos, localidades_filtro=None):
+    """Genera el paquete estatico completo en el directorio de salida"""
+    directorio_escenarios = os.path.join(salida, 'escenarios')
+    os.makedirs(directorio_escenarios, exist_ok=True)
+
+    # Las opciones se leen de la propia app para no duplicarlas aqui
+    app = _crear_app()
+    localidades = list(_widget(app.selectbox, ETIQUETA_LOCALIDAD).options)
+    variables = list(_widget(app.radio, ETIQUETA_VARIABLE).options)
+    exportables = _pestanas_exportables(app)
+    pestanas = [t.label for t in exportables]
+    pestana_zonas = _indice_pestana(exportables, ETIQUETA_ZONAS)
+    del app
+    if localidades_filtro:
+        localidades = [l for l in localidades if l in localidades_filtro]
+
+    escenarios = [(g, l) for g in combinaciones_grupos() for l in localidades]
+    print(f"Renderizando {len(escenarios)} escenarios con {procesos} procesos...")
+
+    geometrias, capas = {}, {}
+    inicio = time.time()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_worker,
+                             initargs=(directorio_escenarios,)) as pool:
+        futuros = [pool.submit(renderizar_escenario, g, l) for g, l in escenarios]
+        for n, futuro in enumerate(as_completed(futuros), start=1):
+            escenario, nuevas, capas_escenario = futuro.result()
+            geometrias.update(nuevas)
+            for clave, valor in capas_escenario.items():
+                capas.setdefault(clave, valor)
+            print(f"  [{n}/{len(escenarios)}] {escenario} ({time.time() - inicio:.0f}s)")
+
+    with open(os.path.join(salida, 'geometrias.json'), 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': list(geometrias.values())},
+                  f, separators=(',', ':'))
+    with open(os.path.join(salida, 'localidades.json'), 'w', encoding='utf-8') as f:
+        json.dump(capas.get(REF_LOCALIDADES), f, separators=(',', ':'))
+
+    manifiesto = {
+        'grupos': GRUPOS,
+        'localidades': localidades,
+        'variables': variables,
+        'pestanas': pestanas,
+        'pestana_zonas': pestana_zonas,
+        'escenarios': {id_escenario(g, l): {'grupos': g, 'localidad': l} for g, l in escenarios},
+    }
+    with open(os.path.join(salida, 'manifiesto.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+
+    with open(os.path.join(salida, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+        f.write(plotly.offline.get_plotlyjs())
+    with open(os.path.join(salida, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(PLANTILLA_HTML)
+
+    print(f"Listo: {len(escenarios)} escenarios en {salida} ({time.time() - inicio:.0f}s)")
+
+
+PLANTILLA_HTML = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Tablero JCO - Priorizacion (version estatica)</title>
+<script src="plotly.min.js"></script>
+<style>
+  body { font-family: sans-serif; margin: 0; display: flex; color: #1a1a2e; }
+  aside { width: 240px; padding: 1rem; background: #f0f2f6; min-height: 100vh; box-sizing: border-box; }
+  main { flex: 1; padding: 1rem 2rem; min-width: 0; }
+  h1 { color: #1E3A5F; text-align: center; }
+  .metricas { display: flex; flex-wrap: wrap; gap: 0.5rem; margin-bottom: 1rem; }
+  .metrica { background: #f8f9fa; padding: 0.8rem 1rem; border-radius: 10px; border-left: 4px solid #667eea; }
+  .metrica small { display: block; color: #555; }
+  .metrica strong { font-size: 1.4rem; }
+  .pestanas button { padding: 0.5rem 1rem; border: none; background: none; cursor: pointer; }
+  .pestanas button.activa { border-bottom: 3px solid #ff4b4b; font-weight: bold; }
+  .tabla { max-height: 500px; overflow: auto; margin: 1rem 0; }
+  table { border-collapse: collapse; font-size: 0.85rem; width: 100%; }
+  th, td { border-bottom: 1px solid #ddd; padding: 0.25rem 0.5rem; text-align: right; }
+  th { position: sticky; top: 0; background: #fafafa; }
+  @media (max-width: 700px) { body { flex-direction: column; } aside { width: 100%; min-height: 0; } main { padding: 0.5rem; } }
+</style>
+</head>
+<body>
+<aside>
+  <h3>Grupos SISBEN</h3>
+  <div id="grupos"></div>
+  <h3>Filtros adicionales</h3>
+  <label>Localidad<br><select id="localidad"></select></label>
+  <p><small>Rango de ranking fijo en el valor por defecto. Para rangos personalizados use el tablero en vivo.</small></p>
+</aside>
+<main>
+  <h1>Tablero de priorizacion con datos del SISBEN</h1>
+  <div class="metricas" id="resumen"></div>
+  <div class="pestanas" id="pestanas"></div>
+  <div id="variables" style="display:none"></div>
+  <div id="contenido"></div>
+</main>
+<script>
+let manifiesto, geometrias, localidades, escenario, pestanaActiva = 0, variableActiva;
+
+const cargar = url => fetch(url).then(r => r.json());
+const formato = v => typeof v === 'number' ? v.toLocaleString('es-CO', {maximumFractionDigits: 3}) : (v ?? '');
+
+function idEscenario() {
+  const grupos = manifiesto.grupos.filter(g => document.getElementById('grupo-' + g).checked);
+  const loc = document.getElementById('localidad').value;
+  const id = Object.keys(manifiesto.escenarios).find(k =>
+    manifiesto.escenarios[k].localidad === loc && manifiesto.escenarios[k].grupos.join('') === grupos.join(''));
+  return id || Object.keys(manifiesto.escenarios).find(k =>
+    manifiesto.escenarios[k].localidad === loc && manifiesto.escenarios[k].grupos.join('') === 'ABC');
+}
+
+function resolverFigura(spec) {
+  for (const traza of spec.data) if (traza.geojson === '@geometrias') traza.geojson = geometrias;
+  for (const capa of ((spec.layout.mapbox || {}).layers || [])) if (capa.source === '@localidades') capa.source = localidades;
+  return spec;
+}
+
+function metricas(lista) {
+  return lista.map(m => `<div class="metrica"><small>${m.etiqueta}</small><strong>${m.valor}</strong></div>`).join('');
+}
+
+function tabla(t) {
+  const cab = t.columns.map(c => `<th>${c}</th>`).join('');
+  const filas = t.data.map(f => '<tr>' + f.map(v => `<td>${formato(v)}</td>`).join('') + '</tr>').join('');
+  return `<div class="tabla"><table><thead><tr>${cab}</tr></thead><tbody>${filas}</tbody></table></div>`;
+}
+
+function renderizar() {
+  const zonas = pestanaActiva === manifiesto.pestana_zonas;
+  document.getElementById('variables').style.display = zonas ? 'block' : 'none';
+  const bloque = zonas ? escenario.zonas_calientes[variableActiva] : escenario.pestanas[pestanaActiva];
+  const cont = document.getElementById('contenido');
+  cont.innerHTML = `<div class="metricas">${metricas(bloque.metricas)}</div>` +
+    bloque.figuras.map((_, i) => `<div id="figura-${i}"></div>`).join('') +
+    bloque.tablas.map(tabla).join('');
+  bloque.figuras.forEach((spec, i) => {
+    const fig = resolverFigura(JSON.parse(JSON.stringify(spec)));
+    Plotly.newPlot('figura-' + i, fig.data, fig.layout, {responsive: true});
+  });
+  document.querySelectorAll('.pestanas button').forEach((b, i) => b.classList.toggle('activa', i === pestanaActiva));
+}
+
+async function actualizar() {
+  const id = idEscenario();
+  location.hash = id;
+  escenario = await cargar(`escenarios/${id}.json`);
+  document.getElementById('resumen').innerHTML = metricas(escenario.resumen);
+  renderizar();
+}
+
+async function iniciar() {
+  [manifiesto, geometrias, localidades] = await Promise.all(
+    ['manifiesto.json', 'geometrias.json', 'localidades.json'].map(cargar));
+  const previo = manifiesto.escenarios[location.hash.slice(1)] || {grupos: ['A', 'B', 'C'], localidad: manifiesto.localidades[0]};
+
+  document.getElementById('grupos').innerHTML = manifiesto.grupos.map(g =>
+    `<label><input type="checkbox" id="grupo-${g}" ${previo.grupos.includes(g) ? 'checked' : ''}> Grupo ${g}</label><br>`).join('');
+  const sel = document.getElementById('localidad');
+  sel.innerHTML = manifiesto.localidades.map(l => `<option>${l}</option>`).join('');
+  sel.value = previo.localidad;
+
+  document.getElementById('pestanas').innerHTML = manifiesto.pestanas.map((p, i) => `<button data-i="${i}">${p}</button>`).join('');
+  document.querySelectorAll('.pestanas button').forEach(b => b.onclick = () => { pestanaActiva = +b.dataset.i; renderizar(); });
+
+  variableActiva = manifiesto.variables[0];
+  document.getElementById('variables').innerHTML = manifiesto.variables.map((v, i) =>
+    `<label><input type="radio" name="variable" value="${v}" ${i === 0 ? 'checked' : ''}> ${v}</label> `).join('');
+  document.querySelectorAll('input[name=variable]').forEach(r => r.onchange = () => { variableActiva = r.value; renderizar(); });
+
+  document.querySelectorAll('aside input, aside select').forEach(e => e.onchange = actualizar);
+  actualizar();
+}
+
+iniciar();
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporta todos los escenarios del tablero a HTML/JSON estatico")
+    parser.add_argument('--salida', default=os.path.join(SCRIPT_DIR, 'estatico'),
+                        help="Directorio donde se escribe el paquete estatico")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count(),
+                        help="Numero de procesos en paralelo")
+    parser.add_argument('--localidades', nargs='*',
+                        help="Exportar solo estas localidades (por defecto todas)")
+    args = parser.parse_args()
+
+    # AppTest ejecuta app.py como __main__, asi que el pool debe recibir las
+    # funciones desde el modulo importado y no desde este script
+    import exportar_estatico
+    exportar_estatico.exportar(args.salida, args.procesos, args.localidades)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Mapas raster del Tablero JCO (modo liviano)
+
+Proyecta la geometria de las UPZ a EPSG:3857 en rutas de matplotlib y dibuja en
+el servidor el mapa coropletico como imagen WebP. No depende de Streamlit; app.py
+cachea la geometria proyectada y las imagenes.
+"""
+
+import io
+
+import numpy as np
+import shapely
+from matplotlib.cm import ScalarMappable
+from matplotlib.collections import PathCollection
+from matplotlib.colors import LinearSegmentedColormap, Normalize
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+from matplotlib.path import Path
+
+
+def _ruta_matplotlib(geom):
+    """Convierte un (Multi)Polygon en una ruta compuesta de matplotlib (con huecos)"""
+    vertices, codigos = [], []
+    for poligono in shapely.get_parts(geom):
+        for anillo in [poligono.exterior, *poligono.interiors]:
+            coords = np.asarray(anillo.coords)[:, :2]
+            vertices.append(coords)
+            codigos.append(np.r_[Path.MOVETO, np.full(len(coords) - 2, Path.LINETO), Path.CLOSEPOLY])
+    return Path(np.concatenate(vertices), np.concatenate(codigos).astype(Path.code_type))
+
+
+def proyectar_geometria(hechos):
+    """
+    Geometria en EPSG:3857 lista para dibujar, en el orden de IDX_UPZ
+
+    Returns:
+        dict con rutas de matplotlib por UPZ, limites (minx, miny, maxx, maxy)
+        por UPZ, un punto interior por UPZ y las rutas de contorno de localidades
+    """
+    proyectada = hechos[['LOCALIDAD', 'geometry']].to_crs(epsg=3857)
+    geometrias = proyectada.geometry.values
+    localidades = proyectada[proyectada.geometry.notna()].dissolve(by='LOCALIDAD')
+    return {
+        'rutas': [None if g is None else _ruta_matplotlib(g) for g in geometrias],
+        'limites': shapely.bounds(geometrias),
+        'puntos': shapely.get_coordinates(shapely.point_on_surface(geometrias), include_z=False),
+        'contornos': [_ruta_matplotlib(g) for g in localidades.geometry.values],
+    }
+
+
+def extension_vista(geo, posiciones, margen=0.03):
+    """Extension (x0, y0, x1, y1) en EPSG:3857 que encuadra las UPZ en las posiciones dadas"""
+    limites = geo['limites'][posiciones]
+    x0, y0 = np.nanmin(limites[:, 0]), np.nanmin(limites[:, 1])
+    x1, y1 = np.nanmax(limites[:, 2]), np.nanmax(limites[:, 3])
+    dx, dy = (x1 - x0) * margen, (y1 - y0) * margen
+    return x0 - dx, y0 - dy, x1 + dx, y1 + dy
+
+
+def renderizar_mapa_raster(geo, df_datos, color_col, escala, rango, titulo,
+                           colores_categoria=None, ancho_px=720):
+    """
+    Dibuja en el servidor el mapa coropletico de df_datos como imagen WebP
+
+    Args:
+        geo: Geometria proyectada de la tabla de hechos (proyectar_geometria)
+        df_datos: UPZ a dibujar, indexadas por IDX_UPZ
+        color_col: Columna que define el color
+        escala: Escala continua [[posicion, color], ...] (si no es categorica)
+        rango: [minimo, maximo] de la escala continua
+        titulo: Titulo de la leyenda
+        colores_categoria: dict valor -> color para variables categoricas
+
+    Returns:
+        bytes de la imagen WebP
+    """
+    x0, y0, x1, y1 = extension_vista(geo, df_datos.index.to_numpy())
+    con_geometria = [i for i in df_datos.index if geo['rutas'][i] is not None]
+    valores = df_datos.loc[con_geometria, color_col]
+
+    fig = Figure(figsize=(ancho_px / 100, ancho_px / 100 * (y1 - y0) / (x1 - x0)), dpi=100)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    ax.set_xlim(x0, x1)
+    ax.set_ylim(y0, y1)
+
+    if colores_categoria is not None:
+        colores = [colores_categoria.get(v, '#eeeeee') for v in valores]
+        leyenda = [Patch(facecolor=c, edgecolor='#999999', label=k)
+                   for k, c in colores_categoria.items() if k in set(valores)]
+        ax.legend(handles=leyenda, title=titulo, loc='lower right', fontsize=8, title_fontsize=9)
+    else:
+        cmap = LinearSegmentedColormap.from_list('escala', [(p, c) for p, c in escala])
+        # El rango pedido puede quedar invertido (p. ej. [0, maximo] con todas las
+        # brechas negativas); se amplia para cubrir los valores de la vista
+        vmin = min(rango[0], valores.min()) if len(valores) else rango[0]
+        vmax = max(rango[1], vmin)
+        norma = Normalize(vmin=vmin, vmax=vmax)
+        colores = cmap(norma(valores.to_numpy(dtype=float)))
+        cax = ax.inset_axes([0.86, 0.05, 0.025, 0.35])
+        barra = fig.colorbar(ScalarMappable(norm=norma, cmap=cmap), cax=cax, format='{x:,.0f}')
+        barra.set_label(titulo, fontsize=8)
+        barra.ax.tick_params(labelsize=7)
+        barra.ax.yaxis.set_label_position('left')
+
+    ax.add_collection(PathCollection(
+        [geo['rutas'][i] for i in con_geometria],
+        facecolors=colores, edgecolors='white', linewidths=0.6, alpha=0.85
+    ))
+    ax.add_collection(PathCollection(
+        geo['contornos'], facecolors='none', edgecolors=(0, 0, 0, 0.6), linewidths=1.2
+    ))
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='webp', pil_kwargs={'quality': 80, 'method': 4})
+    return buffer.getvalue()
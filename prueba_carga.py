@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del Tablero JCO
+
+Levanta un servidor real (streamlit run servidor.py) y lo carga con N sesiones
+concurrentes. Cada sesion es un cliente del protocolo de Streamlit (websocket +
+protobuf) que se comporta como una pestana del navegador: pide la pagina, lleva
+el estado de sus widgets, guarda los mensajes cacheables y sigue un guion de
+interacciones realistas (alternar grupos SISBEN, cambiar localidad, mover el
+rango de ranking y cambiar la variable del mapa de zonas calientes). Se mide la
+latencia de cada rerun, desde que se envia hasta que el servidor avisa que el
+script termino.
+
+    python prueba_carga.py --sesiones 1 2 4 8 --interacciones 20
+    python prueba_carga.py --url http://localhost:8501 --sesiones 4
+
+Reporta, por numero de sesiones, p50/p95 de latencia de rerun, sesiones que
+fallaron, uso de CPU y memoria residente (RSS) del proceso del servidor.
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+from websockets.asyncio.client import connect
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVIDOR_FILE = os.path.join(SCRIPT_DIR, 'servidor.py')
+TIMEOUT_APP = 300
+
+GRUPOS = ['A', 'B', 'C', 'D']
+ETIQUETA_VARIABLE = "Colorear el mapa por:"
+ETIQUETA_LOCALIDAD = "Localidad"
+ETIQUETA_RANGO = "Seleccionar rango"
+
+# Widgets cuyo estado lleva el cliente (los que usa el guion)
+TIPOS_WIDGET = ('checkbox', 'radio', 'selectbox', 'slider')
+
+
+# ============================================
+# CLIENTE
+# ============================================
+class SesionRemota:
+    """
+    Sesion de navegador simulada contra un servidor de Streamlit
+
+    Guarda los widgets de la ultima ejecucion y los valores que la sesion les
+    fijo (se envian en cada rerun, como hace el navegador) y una cache de los
+    mensajes cacheables, de modo que el servidor responda con referencias en
+    lugar de repetir las figuras que la sesion ya recibio.
+    """
+
+    def __init__(self, url_ws):
+        self.url_ws = url_ws
+        self.ws = None
+        self.widgets = {}
+        self.valores = {}
+        self.cache = {}
+
+    async def conectar(self):
+        self.ws = await connect(self.url_ws, subprotocols=['streamlit'], max_size=None,
+                                open_timeout=60)
+
+    async def cerrar(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def widget(self, tipo, etiqueta):
+        try:
+            return self.widgets[(tipo, etiqueta)]
+        except KeyError:
+            raise KeyError(f"No se encontro el control '{etiqueta}' en app.py") from None
+
+    def valor(self, widget):
+        """Valor actual del widget: el fijado por la sesion o el que trae el servidor"""
+        if widget.id in self.valores:
+            return self.valores[widget.id]
+        tipo = type(widget).__name__
+        if tipo == 'Checkbox':
+            return widget.default
+        if tipo == 'Slider':
+            return list(widget.default)
+        return widget.options[widget.default]
+
+    def fijar(self, widget, valor):
+        self.valores[widget.id] = valor
+
+    def _estado_widgets(self):
+        estados = WidgetStates()
+        for widget in self.widgets.values():
+            if widget.id not in self.valores:
+                continue
+            valor = self.valores[widget.id]
+            estado = estados.widgets.add()
+            estado.id = widget.id
+            tipo = type(widget).__name__
+            if tipo == 'Checkbox':
+                estado.bool_value = valor
+            elif tipo == 'Slider':
+                estado.double_array_value.data[:] = valor
+            else:
+                estado.string_value = valor
+        return estados
+
+    async def ejecutar(self):
+        """
+        Pide un rerun con el estado actual de los widgets y espera a que termine
+
+        Returns:
+            Tupla (segundos, hubo una excepcion en el script)
+        """
+        mensaje = BackMsg()
+        mensaje.rerun_script.widget_states.CopyFrom(self._estado_widgets())
+        mensaje.rerun_script.cached_message_hashes.extend(self.cache)
+
+        inicio = time.perf_counter()
+        await self.ws.send(mensaje.SerializeToString())
+        widgets, excepcion = {}, False
+        while True:
+            respuesta = ForwardMsg()
+            respuesta.ParseFromString(await self.ws.recv())
+            tipo = respuesta.WhichOneof('type')
+            if tipo == 'ref_hash':
+                respuesta = self.cache[respuesta.ref_hash]
+                tipo = respuesta.WhichOneof('type')
+            elif respuesta.metadata.cacheable:
+                self.cache[respuesta.hash] = respuesta
+
+            if tipo == 'delta' and respuesta.delta.WhichOneof('type') == 'new_element':
+                elemento = respuesta.delta.new_element
+                tipo_elemento = elemento.WhichOneof('type')
+                if tipo_elemento in TIPOS_WIDGET:
+                    w = getattr(elemento, tipo_elemento)
+                    widgets[(tipo_elemento, w.label)] = w
+                elif tipo_elemento == 'exception':
+                    excepcion = True
+            elif tipo == 'script_finished':
+                if respuesta.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    excepcion = True
+                break
+        segundos = time.perf_counter() - inicio
+
+        # Los widgets que ya no aparecen (o cambiaron de id) vuelven a su valor por defecto
+        self.widgets = widgets
+        vigentes = {w.id for w in widgets.values()}
+        self.valores = {i: v for i, v in self.valores.items() if i in vigentes}
+        return segundos, excepcion
+
+
+# ============================================
+# GUION DE INTERACCIONES
+# ============================================
+def alternar_grupo(sesion, rng):
+    """Marca o desmarca un grupo SISBEN (sin dejar la seleccion vacia)"""
+    casillas = {g: sesion.widget('checkbox', f"Grupo {g}") for g in GRUPOS}
+    marcados = [g for g, c in casillas.items() if sesion.valor(c)]
+    g = rng.choice(GRUPOS)
+    if marcados == [g]:
+        g = rng.choice([x for x in GRUPOS if x != g])
+    sesion.fijar(casillas[g], not sesion.valor(casillas[g]))
+
+
+def cambiar_localidad(sesion, rng):
+    """Elige otra localidad, volviendo con frecuencia a 'Todas las localidades'"""
+    selector = sesion.widget('selectbox', ETIQUETA_LOCALIDAD)
+    opciones = list(selector.options)
+    sesion.fijar(selector, opciones[0] if rng.random() < 0.4 else rng.choice(opciones[1:]))
+
+
+def mover_rango(sesion, rng):
+    """Arrastra uno de los extremos del rango de ranking"""
+    slider = sesion.widget('slider', ETIQUETA_RANGO)
+    minimo, maximo = int(slider.min), int(slider.max)
+    inicio, fin = (int(v) for v in sesion.valor(slider))
+    if rng.random() < 0.5:
+        inicio = rng.randint(minimo, fin)
+    else:
+        fin = rng.randint(inicio, maximo)
+    sesion.fijar(slider, [inicio, fin])
+
+
+def cambiar_variable_mapa(sesion, rng):
+    """Cambia la variable con la que se colorea el mapa de zonas calientes"""
+    radio = sesion.widget('radio', ETIQUETA_VARIABLE)
+    actual = sesion.valor(radio)
+    sesion.fijar(radio, rng.choice([o for o in radio.options if o != actual]))
+
+
+# Interaccion -> peso relativo en el guion aleatorio de cada sesion
+INTERACCIONES = {
+    'alternar_grupo': (alternar_grupo, 4),
+    'cambiar_localidad': (cambiar_localidad, 3),
+    'mover_rango': (mover_rango, 2),
+    'cambiar_variable_mapa': (cambiar_variable_mapa, 2),
+}
+
+
+async def simular_sesion(url_ws, n_interacciones, semilla, pausa, registros, fallos, arranque):
+    """
+    Ejecuta una sesion completa y agrega (interaccion, segundos, excepcion) a registros
+
+    La carga inicial de la pagina se registra como 'carga_inicial'. Si la sesion
+    se cae (conexion, tiempo de espera, protocolo) se agrega el error a fallos y
+    sus reruns pendientes quedan fuera de las latencias.
+    """
+    rng = random.Random(semilla)
+    sesion = SesionRemota(url_ws)
+    try:
+        await sesion.conectar()
+        await arranque.wait()
+
+        segundos, excepcion = await asyncio.wait_for(sesion.ejecutar(), TIMEOUT_APP)
+        registros.append(('carga_inicial', segundos, excepcion))
+
+        nombres = list(INTERACCIONES)
+        pesos = [INTERACCIONES[n][1] for n in nombres]
+        for _ in range(n_interacciones):
+            nombre = rng.choices(nombres, weights=pesos)[0]
+            INTERACCIONES[nombre][0](sesion, rng)
+            segundos, excepcion = await asyncio.wait_for(sesion.ejecutar(), TIMEOUT_APP)
+            registros.append((nombre, segundos, excepcion))
+            if pausa:
+                await asyncio.sleep(rng.uniform(0, 2 * pausa))
+    except Exception as e:
+        fallos.append(f"sesion {semilla}: {type(e).__name__}: {e}")
+    finally:
+        try:
+            await sesion.cerrar()
+        except Exception:
+            pass
+
+
+# ============================================
+# SERVIDOR
+# ============================================
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def _estado_http(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as respuesta:
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def esperar_servidor(url, proceso=None):
+    """
+    Espera a que el servidor este listo: /api/listo (servidor.py) o, si no
+    existe, /_stcore/health (streamlit run app.py)
+    """
+    limite = time.perf_counter() + TIMEOUT_APP
+    while time.perf_counter() < limite:
+        if proceso is not None and proceso.poll() is not None:
+            raise RuntimeError(f"El servidor termino con codigo {proceso.returncode}")
+        estado = _estado_http(f"{url}/api/listo")
+        if estado == 200 or (estado == 404 and _estado_http(f"{url}/_stcore/health") == 200):
+            return
+        time.sleep(0.5)
+    raise TimeoutError(f"El servidor en {url} no estuvo listo en {TIMEOUT_APP} s")
+
+
+def iniciar_servidor():
+    """Levanta servidor.py en un puerto libre y devuelve (proceso, url)"""
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', SERVIDOR_FILE,
+         '--server.headless', 'true', '--server.port', str(puerto),
+         '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=SCRIPT_DIR
+    )
+    return proceso, f"http://localhost:{puerto}"
+
+
+# ============================================
+# MEDICION
+# ============================================
+def _cpu_segundos(pid):
+    """CPU (usuario + sistema) acumulada por el proceso del servidor"""
+    if psutil is not None:
+        tiempos = psutil.Process(pid).cpu_times()
+        return tiempos.user + tiempos.system
+    with open(f"/proc/{pid}/stat") as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def _rss_mb(pid):
+    """Memoria residente actual del proceso del servidor"""
+    if psutil is not None:
+        return psutil.Process(pid).memory_info().rss / 1024 ** 2
+    with open(f"/proc/{pid}/status") as f:
+        for linea in f:
+            if linea.startswith('VmRSS:'):
+                return int(linea.split()[1]) / 1024
+    return np.nan
+
+
+def _medible(pid):
+    return pid is not None and (psutil is not None or os.path.exists(f"/proc/{pid}/stat"))
+
+
+async def medir(url_ws, pid, n_sesiones, n_interacciones, semilla, pausa):
+    """Corre n_sesiones concurrentes y devuelve el resumen de la ronda"""
+    registros, fallos = [], []
+    arranque = asyncio.Event()
+    tareas = [
+        asyncio.create_task(simular_sesion(url_ws, n_interacciones, semilla + i, pausa,
+                                           registros, fallos, arranque))
+        for i in range(n_sesiones)
+    ]
+    # Se da tiempo a que todas las sesiones se conecten antes de arrancar
+    await asyncio.sleep(1.0)
+
+    medible = _medible(pid)
+    cpu0 = _cpu_segundos(pid) if medible else np.nan
+    rss_max = _rss_mb(pid) if medible else np.nan
+    t0 = time.perf_counter()
+    arranque.set()
+    pendientes = set(tareas)
+    while pendientes:
+        _, pendientes = await asyncio.wait(pendientes, timeout=0.2)
+        if medible:
+            rss_max = max(rss_max, _rss_mb(pid))
+    pared = time.perf_counter() - t0
+    cpu = _cpu_segundos(pid) - cpu0 if medible else np.nan
+
+    iniciales = np.array([s for n, s, _ in registros if n == 'carga_inicial'])
+    reruns = np.array([s for n, s, _ in registros if n != 'carga_inicial'])
+    return {
+        'sesiones': n_sesiones,
+        'sesiones_fallidas': len(fallos),
+        'reruns': len(reruns),
+        'reruns_esperados': n_sesiones * n_interacciones,
+        'errores': sum(e for _, _, e in registros),
+        'carga_inicial_p50_s': np.percentile(iniciales, 50) if len(iniciales) else np.nan,
+        'rerun_p50_s': np.percentile(reruns, 50) if len(reruns) else np.nan,
+        'rerun_p95_s': np.percentile(reruns, 95) if len(reruns) else np.nan,
+        'rerun_max_s': reruns.max() if len(reruns) else np.nan,
+        'reruns_por_s': len(reruns) / pared,
+        'cpu_pct': 100 * cpu / pared,
+        'rss_max_mb': rss_max,
+        'por_interaccion': {
+            nombre: np.percentile([s for n, s, _ in registros if n == nombre], 50)
+            for nombre in INTERACCIONES if any(n == nombre for n, _, _ in registros)
+        },
+        'fallos': fallos,
+    }
+
+
+async def correr(url, pid, args):
+    url_ws = url.replace('http', 'ws', 1).rstrip('/') + '/_stcore/stream'
+
+    # Una sesion previa llena las caches del proceso, como en una replica ya caliente
+    print("Calentando caches...")
+    registros, fallos = [], []
+    listo = asyncio.Event()
+    listo.set()
+    await simular_sesion(url_ws, 0, args.semilla, 0, registros, fallos, listo)
+    if fallos:
+        raise RuntimeError(f"No se pudo cargar la pagina: {fallos[0]}")
+
+    encabezado = (f"{'sesiones':>8} {'fall':>4} {'reruns':>9} {'err':>4} {'inicial p50':>11} {'p50':>7} "
+                  f"{'p95':>7} {'max':>7} {'rerun/s':>8} {'CPU %':>6} {'RSS MB':>7}")
+    print(encabezado)
+    resultados = []
+    for n in args.sesiones:
+        r = await medir(url_ws, pid, n, args.interacciones, args.semilla, args.pausa)
+        resultados.append(r)
+        reruns = f"{r['reruns']}/{r['reruns_esperados']}"
+        print(f"{r['sesiones']:>8} {r['sesiones_fallidas']:>4} {reruns:>9} {r['errores']:>4} "
+              f"{r['carga_inicial_p50_s']:>10.2f}s {r['rerun_p50_s']:>6.2f}s {r['rerun_p95_s']:>6.2f}s "
+              f"{r['rerun_max_s']:>6.2f}s {r['reruns_por_s']:>8.2f} {r['cpu_pct']:>6.0f} {r['rss_max_mb']:>7.0f}")
+        detalle = ', '.join(f"{k} {v:.2f}s" for k, v in r['por_interaccion'].items())
+        print(f"{'':>8} p50 por interaccion: {detalle}")
+        for fallo in r['fallos']:
+            print(f"{'':>8} FALLO {fallo}")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con sesiones simuladas contra un servidor real")
+    parser.add_argument('--sesiones', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Numeros de sesiones concurrentes a probar")
+    parser.add_argument('--interacciones', type=int, default=15,
+                        help="Interacciones por sesion (ademas de la carga inicial)")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="Pausa media en segundos entre interacciones de una sesion")
+    parser.add_argument('--semilla', type=int, default=2026)
+    parser.add_argument('--url',
+                        help="Servidor ya en marcha (p. ej. http://localhost:8501); "
+                             "si se omite se levanta servidor.py en un puerto libre")
+    parser.add_argument('--csv', help="Archivo CSV donde guardar el resumen")
+    args = parser.parse_args()
+
+    proceso = None
+    if args.url:
+        url, pid = args.url.rstrip('/'), None
+        print("Aviso: servidor externo; no se mide su CPU ni su RSS")
+    else:
+        proceso, url = iniciar_servidor()
+        pid = proceso.pid
+        if not _medible(pid):
+            print("Aviso: sin psutil ni /proc no se mide CPU ni RSS del servidor")
+    try:
+        print(f"Esperando al servidor en {url}...")
+        esperar_servidor(url, proceso)
+        resultados = asyncio.run(correr(url, pid, args))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    if args.csv:
+        campos = [k for k in resultados[0] if k not in ('por_interaccion', 'fallos')]
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.DictWriter(f, fieldnames=campos, extrasaction='ignore')
+            escritor.writeheader()
+            escritor.writerows(resultados)
+
+    if any(r['sesiones_fallidas'] for r in resultados):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
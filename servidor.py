@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor del Tablero JCO con arranque en caliente
+
+Envuelve app.py en una aplicacion ASGI de Streamlit (st.App) para poder actuar
+al arrancar el proceso, sin esperar al primer visitante:
+
+- Al iniciar, ejecuta app.py dentro del servidor en segundo plano, reintentando
+  hasta que termine sin errores; eso carga las fuentes, arma la tabla de
+  hechos, precalienta las caches derivadas (preparar_servidor) y deja en cache
+  los mapas de la vista por defecto.
+- Expone /api/listo, que solo lee una bandera: responde 200 cuando el
+  calentamiento termino y 503 mientras tanto. Sirve como sonda de
+  disponibilidad sin ejecutar el tablero en cada consulta.
+
+    streamlit run servidor.py
+    curl http://localhost:8501/api/listo
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pandas as pd
+import streamlit as st
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from streamlit.runtime import Runtime
+
+# Estado del calentamiento, compartido por todo el proceso
+estado = {
+    'listo': False,
+    'resultado': 'calentando',
+    'inicio': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+    'segundos': None,
+    'intentos': 0,
+}
+# Espera maxima entre intentos de calentamiento fallidos
+PAUSA_MAXIMA_S = 30
+
+
+async def calentar():
+    """
+    Ejecuta app.py en una sesion interna hasta que termine sin errores y marca
+    el proceso como listo
+
+    Streamlit abandona cada intento a los 60 s; en un arranque en frio lento (o
+    tras un error transitorio) se reintenta, y los calculos ya cacheados por los
+    intentos anteriores no se repiten.
+    """
+    inicio = time.perf_counter()
+    while not estado['listo']:
+        estado['intentos'] += 1
+        try:
+            ok, mensaje = await Runtime.instance().does_script_run_without_error()
+        except Exception as e:
+            ok, mensaje = False, str(e)
+        estado['resultado'] = mensaje
+        estado['segundos'] = round(time.perf_counter() - inicio, 1)
+        estado['listo'] = ok
+        if not ok:
+            await asyncio.sleep(min(5 * estado['intentos'], PAUSA_MAXIMA_S))
+
+
+async def listo(request):
+    """Sonda de disponibilidad: 200 si el tablero ya esta caliente, 503 si no"""
+    return JSONResponse(estado, status_code=200 if estado['listo'] else 503)
+
+
+@asynccontextmanager
+async def arranque(app):
+    tarea = asyncio.create_task(calentar())
+    yield
+    tarea.cancel()
+
+
+app = st.App("app.py", lifespan=arranque, routes=[Route("/api/listo", listo)])
+
+if __name__ == "__main__":
+    app.run()
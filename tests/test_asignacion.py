@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la asignacion de cupos de ruta corta"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import asignacion
+
+
+def tabla_brechas(vulnerables, beneficiarios, localidades):
+    """
+    Arma una tabla con las columnas que asignar_cupos toma de calcular_brecha_dinamica
+
+    Returns:
+        DataFrame con VULNERABLES_SEL, BENEFICIARIOS_RUTA_CORTA, BRECHA_DIN y LOCALIDAD
+    """
+    df = pd.DataFrame({
+        'VULNERABLES_SEL': vulnerables,
+        'BENEFICIARIOS_RUTA_CORTA': beneficiarios,
+        'LOCALIDAD': localidades,
+    })
+    df['BRECHA_DIN'] = df['VULNERABLES_SEL'] - df['BENEFICIARIOS_RUTA_CORTA']
+    return df
+
+
+def casos_aleatorios(n_casos, n_upz, semilla):
+    """Tablas pequeñas al azar, con capacidad y topes por localidad"""
+    rng = np.random.default_rng(semilla)
+    for _ in range(n_casos):
+        vulnerables = rng.integers(1, 8, n_upz)
+        beneficiarios = rng.integers(0, vulnerables + 1)
+        localidades = rng.choice(['Bosa', 'Usme'], n_upz)
+        topes = {'Bosa': int(rng.integers(0, 6))} if rng.random() < 0.7 else None
+        capacidad = int(rng.integers(0, 12))
+        yield tabla_brechas(vulnerables, beneficiarios, localidades), capacidad, topes
+
+
+def fuerza_bruta(df, capacidad, topes):
+    """
+    Mejor reparto para el objetivo 'brecha' probando todas las combinaciones
+
+    Returns:
+        Maximo de sum(peso * cupos): la brecha ponderada que se logra reducir
+    """
+    brecha = df['BRECHA_DIN'].clip(lower=0).to_numpy()
+    peso = brecha / df['VULNERABLES_SEL'].to_numpy()
+    localidad = df['LOCALIDAD'].to_numpy()
+    mejor = 0.0
+    for cupos in itertools.product(*(range(b + 1) for b in brecha)):
+        cupos = np.array(cupos)
+        if cupos.sum() > capacidad:
+            continue
+        if any(cupos[localidad == loc].sum() > tope for loc, tope in (topes or {}).items()):
+            continue
+        mejor = max(mejor, float(peso @ cupos))
+    return mejor
+
+
+@pytest.mark.parametrize('objetivo', ['brecha', 'umbral'])
+def test_respeta_capacidad_brechas_y_topes(objetivo):
+    for df, capacidad, topes in casos_aleatorios(200, 8, semilla=7):
+        resultado = asignacion.asignar_cupos(df, capacidad, objetivo=objetivo, umbral=60,
+                                             topes_localidad=topes)
+        cupos = resultado['CUPOS']
+        assert (cupos >= 0).all()
+        assert cupos.sum() <= capacidad
+        assert (cupos <= df['BRECHA_DIN'].clip(lower=0)).all()
+        for loc, tope in (topes or {}).items():
+            assert cupos[df['LOCALIDAD'] == loc].sum() <= tope
+
+
+def test_brecha_igual_a_fuerza_bruta():
+    for df, capacidad, topes in casos_aleatorios(60, 4, semilla=11):
+        resultado = asignacion.asignar_cupos(df, capacidad, objetivo='brecha', topes_localidad=topes)
+        peso = df['BRECHA_DIN'] / df['VULNERABLES_SEL']
+        logrado = float(peso @ resultado['CUPOS'])
+        assert logrado == pytest.approx(fuerza_bruta(df, capacidad, topes))
+
+
+def test_umbral_financia_las_upz_mas_baratas():
+    # Umbral 50%: la primera necesita 1 cupo, la segunda 4 y la tercera ya lo cumple
+    df = tabla_brechas([10, 10, 10], [4, 1, 6], ['Bosa', 'Bosa', 'Usme'])
+    resultado = asignacion.asignar_cupos(df, 1, objetivo='umbral', umbral=50)
+    assert resultado['CUPOS'].tolist() == [1, 0, 0]
+    assert resultado['TASA_COB_NUEVA'].tolist() == [50.0, 10.0, 60.0]
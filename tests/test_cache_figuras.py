@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la cache LRU de figuras"""
+
+from cache_figuras import CacheFiguras
+
+
+def test_descarta_las_menos_usadas_por_bytes():
+    cache = CacheFiguras(max_bytes=10)
+    cache.guardar('a', b'aaaa')
+    cache.guardar('b', b'bbbb')
+    # Leer 'a' la vuelve la mas reciente: al pasar del limite sale 'b'
+    assert cache.obtener('a') == b'aaaa'
+    cache.guardar('c', b'cccc')
+
+    assert cache.obtener('b') is None
+    assert cache.obtener('a') == b'aaaa'
+    assert cache.obtener('c') == b'cccc'
+    assert cache.estadisticas() == {
+        'aciertos': 3, 'fallos': 1, 'figuras': 2, 'bytes': 8, 'max_bytes': 10,
+    }
+
+
+def test_reemplazo_y_figura_mas_grande_que_la_cache():
+    cache = CacheFiguras(max_bytes=10)
+    cache.guardar('a', b'aaaa')
+    cache.guardar('a', b'aaaaaa')
+    assert cache.estadisticas()['bytes'] == 6
+
+    # No se guarda ni desplaza a las demas
+    cache.guardar('grande', b'x' * 11)
+    assert cache.obtener('grande') is None
+    assert cache.obtener('a') == b'aaaaaa'
+
+    # Una figura que llena la cache sola desplaza a todas las anteriores
+    cache.guardar('justa', b'y' * 10)
+    assert cache.obtener('a') is None
+    assert cache.estadisticas()['figuras'] == 1
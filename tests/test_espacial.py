@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la ubicacion de puntos en UPZ"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Polygon, box
+
+import espacial
+
+
+@pytest.fixture
+def hechos_cuadricula():
+    """
+    Cuadricula 4x4 de UPZ cerca de Bogota: una con hueco, la ultima montada
+    sobre las nueve de abajo a la izquierda (hay UPZ superpuestas en el
+    shapefile), una fila extra sin geometria e IDX_UPZ que no coinciden con la
+    posicion de la fila
+
+    Returns:
+        GeoDataFrame indexado por IDX_UPZ
+    """
+    xs, ys = np.linspace(-74.15, -74.09, 5), np.linspace(4.55, 4.61, 5)
+    celdas = [box(xs[c], ys[f], xs[c + 1], ys[f + 1]) for f in range(4) for c in range(4)]
+    celdas[7] = Polygon(celdas[7].exterior.coords,
+                        [celdas[7].buffer(-0.004).exterior.coords])
+    celdas[15] = celdas[15].union(box(xs[0], ys[0], xs[3], ys[3]).buffer(-0.001))
+    celdas.append(None)
+    indice = pd.Index(np.arange(17) * 10 + 3, name='IDX_UPZ')
+    return gpd.GeoDataFrame({'UPZ': [f'UPZ {i}' for i in range(17)]}, geometry=celdas,
+                            crs='EPSG:4326', index=indice)
+
+
+def test_igual_a_sjoin_within(hechos_cuadricula):
+    rng = np.random.default_rng(3)
+    lon = rng.uniform(-74.16, -74.08, 2000)
+    lat = rng.uniform(4.54, 4.62, 2000)
+    # Puntos sin coordenada y sobre el borde entre dos UPZ de la columna
+    # derecha (no estan dentro de ninguna)
+    x_min, _, x_max, y_borde = hechos_cuadricula.geometry.iloc[3].bounds
+    lon[:5] = np.nan
+    lon[5:10], lat[5:10] = rng.uniform(x_min, x_max, 5), y_borde
+
+    obtenido = espacial.ubicar_puntos(espacial.construir_indice(hechos_cuadricula), lon, lat)
+
+    puntos = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs='EPSG:4326')
+    poligonos = hechos_cuadricula[hechos_cuadricula.geometry.notna()].reset_index()
+    unidos = gpd.sjoin(puntos, poligonos, how='left', predicate='within')
+    esperado = unidos['IDX_UPZ'].fillna(-1).astype(int).groupby(level=0).first()
+
+    np.testing.assert_array_equal(obtenido, esperado.to_numpy())
+    assert (obtenido[:10] == -1).all()
+    assert (obtenido >= 0).any() and (obtenido == -1).any()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de las estadisticas espaciales locales (Gi* y Moran local)"""
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+import estadisticas
+
+
+@pytest.fixture
+def cuadricula_con_isla():
+    """
+    Cuadricula 5x5 de unidades con vecindad tipo reina mas una unidad aislada
+    al final (sin vecinos, como una UPZ separada del resto de la ciudad)
+
+    Returns:
+        Tupla (valores, matriz CSR de vecindad, posicion de la isla)
+    """
+    lado = 5
+    filas, columnas = [], []
+    for f in range(lado):
+        for c in range(lado):
+            for df in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    f2, c2 = f + df, c + dc
+                    if (df or dc) and 0 <= f2 < lado and 0 <= c2 < lado:
+                        filas.append(f * lado + c)
+                        columnas.append(f2 * lado + c2)
+    n = lado * lado + 1
+    w = sparse.csr_matrix((np.ones(len(filas)), (filas, columnas)), shape=(n, n))
+
+    # Esquina superior izquierda con valores altos; la isla con un valor bajo
+    valores = np.ones(n)
+    valores[[0, 1, 5, 6]] = 100.0
+    valores[-1] = 0.0
+    return valores, w, n - 1
+
+
+def test_unidad_aislada_no_es_significativa(cuadricula_con_isla):
+    valores, w, isla = cuadricula_con_isla
+    stats = estadisticas.estadisticas_locales(valores, w)
+
+    assert stats.loc[isla, 'GI_P'] == 1.0
+    assert stats.loc[isla, 'MORAN_P'] == 1.0
+
+
+def test_detecta_punto_caliente(cuadricula_con_isla):
+    valores, w, _ = cuadricula_con_isla
+    stats = estadisticas.estadisticas_locales(valores, w)
+
+    assert stats.loc[0, 'GI_Z'] > 0
+    assert stats.loc[0, 'GI_P'] < 0.05
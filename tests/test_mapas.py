@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del mapa raster del modo liviano"""
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+import mapas
+
+ESCALA = [[0, '#ffffcc'], [1, '#bd0026']]
+
+
+@pytest.fixture
+def geo_cuadricula():
+    """
+    Geometria proyectada de cuatro UPZ cuadradas en dos localidades, cerca de Bogota
+
+    Returns:
+        dict de mapas.proyectar_geometria
+    """
+    celdas = [box(-74.10 + 0.01 * c, 4.60 + 0.01 * f, -74.09 + 0.01 * c, 4.61 + 0.01 * f)
+              for f in range(2) for c in range(2)]
+    hechos = gpd.GeoDataFrame({'LOCALIDAD': ['Bosa', 'Bosa', 'Usme', 'Usme']},
+                              geometry=celdas, crs='EPSG:4326')
+    return mapas.proyectar_geometria(hechos)
+
+
+def test_brechas_todas_negativas(geo_cuadricula):
+    # Como en app.py: rango [0, maximo] con el maximo por debajo de cero
+    df = pd.DataFrame({'BRECHA_DIN': [-120, -40, -15, -3]})
+    imagen = mapas.renderizar_mapa_raster(
+        geo_cuadricula, df, 'BRECHA_DIN', ESCALA, [0, df['BRECHA_DIN'].max()], 'Brecha'
+    )
+    assert imagen[:4] == b'RIFF' and imagen[8:12] == b'WEBP'
+
+
+def test_valores_constantes(geo_cuadricula):
+    df = pd.DataFrame({'BRECHA_DIN': [0, 0, 0, 0]})
+    imagen = mapas.renderizar_mapa_raster(
+        geo_cuadricula, df, 'BRECHA_DIN', ESCALA, [0, 0], 'Brecha'
+    )
+    assert imagen[8:12] == b'WEBP'
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""
+Validacion de datos del Tablero JCO
+
+Etapa de ingesta que revisa las fuentes (poblacion SISBEN, brechas y geometria
+de UPZ) de forma vectorizada y compila una tabla de hechos limpia:
+
+- columnas obligatorias y tipos (conteos enteros no negativos)
+- CODIGO_UPZ validos y sin repetir
+- GRUPO_A..D contra JOVENES_TOTAL
+- HOMBRES_* + MUJERES_* contra GRUPO_*
+- cobertura de codigos UPZ entre poblacion, shapefile, Excel de geodatos y brechas
+
+    python validacion.py
+
+Escribe el artefacto tabla_hechos.parquet y el reporte reporte_validacion.json.
+app.py carga el artefacto directamente mientras las huellas de las fuentes
+(y de este mismo archivo, que define las reglas) coincidan; si no existe o esta desactualizado, hace la misma validacion al
+arrancar. Las filas que no pasan se descartan aqui (y quedan en el reporte),
+de modo que el tablero no necesita revisar fila por fila en cada rerun.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = os.path.join(SCRIPT_DIR, 'Tabla_Completa_Priorizacion_JCO.xlsx')
+SHAPEFILE_PATH = os.path.join(SCRIPT_DIR, 'UPZ06_22', 'pensionadosupz_0622.shp')
+GEO_EXCEL = os.path.join(SCRIPT_DIR, 'upz-bogota-para-shape-con-resultad.xlsx')
+BRECHAS_FILE = os.path.join(SCRIPT_DIR, 'brechas_por_upz.csv')
+
+ARTEFACTO = os.path.join(SCRIPT_DIR, 'tabla_hechos.parquet')
+REPORTE = os.path.join(SCRIPT_DIR, 'reporte_validacion.json')
+
+GRUPOS = ['A', 'B', 'C', 'D']
+
+# Columnas obligatorias de cada fuente
+COLUMNAS_TEXTO = ['UPZ', 'LOCALIDAD']
+CONTEOS_POBLACION = (
+    ['RANKING', 'JOVENES_VULNERABLES', 'JOVENES_TOTAL']
+    + [f'GRUPO_{g}' for g in GRUPOS]
+    + [f'{sexo}_{g}' for sexo in ['HOMBRES', 'MUJERES'] for g in GRUPOS]
+)
+COLUMNAS_BRECHAS = ['BENEFICIARIOS_RUTA_CORTA', 'TASA_COBERTURA', 'BRECHA_ABSOLUTA']
+
+
+class ErrorValidacion(Exception):
+    """La fuente de poblacion no se puede usar (sin ella no hay tablero)"""
+
+
+class Reporte:
+    """Hallazgos de la validacion, en el orden en que se encuentran"""
+
+    def __init__(self):
+        self.hallazgos = []
+        self.resumen = {}
+
+    def agregar(self, nivel, fuente, regla, mensaje, codigos=()):
+        """
+        Args:
+            nivel: 'error' (filas descartadas) o 'aviso' (filas conservadas)
+            fuente: 'poblacion', 'brechas', 'shapefile' o 'excel'
+            regla: identificador corto de la regla que fallo
+            codigos: CODIGO_UPZ afectados
+        """
+        self.hallazgos.append({
+            'nivel': nivel,
+            'fuente': fuente,
+            'regla': regla,
+            'mensaje': mensaje,
+            'codigos': [int(c) for c in codigos],
+        })
+
+    def a_dict(self):
+        return {'resumen': self.resumen, 'hallazgos': self.hallazgos}
+
+
+# ============================================
+# LECTURA DE FUENTES
+# ============================================
+def leer_shapefile(ruta=SHAPEFILE_PATH):
+    """Shapefile de UPZ sin las UPR rurales, con CODIGO_UPZ entero y en WGS84"""
+    gdf = gpd.read_file(ruta)
+    gdf = gdf[gdf['UPLCODIGO'].str.startswith('UPZ', na=False)].copy()
+    gdf['CODIGO_UPZ'] = pd.to_numeric(gdf['UPLCODIGO'].str.replace('UPZ', ''), errors='coerce')
+    return gdf.to_crs(epsg=4326)
+
+
+def huella_fuentes():
+    """
+    sha256 de cada archivo fuente presente (el shapefile incluye .dbf, .shx, .prj, ...)
+
+    Incluye validacion.py: si cambian las reglas o el esquema de la tabla de
+    hechos, el artefacto compilado con la version anterior queda desactualizado.
+
+    Returns:
+        dict nombre de archivo -> huella
+    """
+    base = os.path.splitext(SHAPEFILE_PATH)[0]
+    archivos = [os.path.abspath(__file__), DATA_FILE, GEO_EXCEL, BRECHAS_FILE] + sorted(glob.glob(base + '.*'))
+    huellas = {}
+    for ruta in archivos:
+        if os.path.exists(ruta):
+            with open(ruta, 'rb') as f:
+                huellas[os.path.relpath(ruta, SCRIPT_DIR)] = hashlib.sha256(f.read()).hexdigest()
+    return huellas
+
+
+# ============================================
+# REGLAS
+# ============================================
+def _conteos_validos(df, columnas):
+    """
+    Convierte las columnas a numero y marca las filas con conteos invalidos
+
+    Returns:
+        Tupla (DataFrame de conteos como float, Serie booleana de filas invalidas)
+    """
+    conteos = df[columnas].apply(pd.to_numeric, errors='coerce')
+    valores = conteos.to_numpy(dtype=float)
+    invalidos = np.isnan(valores) | (valores < 0) | (valores != np.round(valores))
+    return conteos, pd.Series(invalidos.any(axis=1), index=df.index)
+
+
+def _codigos_validos(serie):
+    codigos = pd.to_numeric(serie, errors='coerce')
+    return codigos, codigos.isna() | (codigos != codigos.round())
+
+
+def validar_poblacion(df, reporte):
+    """
+    Valida la tabla de poblacion y devuelve solo las filas limpias, con los
+    conteos como int64, sin CODIGO_UPZ repetidos y ordenada por CODIGO_UPZ
+
+    Raises:
+        ErrorValidacion: si faltan columnas obligatorias
+    """
+    faltantes = [c for c in ['CODIGO_UPZ'] + COLUMNAS_TEXTO + CONTEOS_POBLACION if c not in df.columns]
+    if faltantes:
+        reporte.agregar('error', 'poblacion', 'columnas', f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+        raise ErrorValidacion(f"Faltan columnas en los datos de poblacion: {', '.join(faltantes)}")
+
+    reporte.resumen['filas_poblacion'] = len(df)
+    codigos, codigo_invalido = _codigos_validos(df['CODIGO_UPZ'])
+    if codigo_invalido.any():
+        reporte.agregar('error', 'poblacion', 'codigo',
+                        f"Se descartan {codigo_invalido.sum()} filas sin CODIGO_UPZ entero")
+
+    conteos, conteo_invalido = _conteos_validos(df, CONTEOS_POBLACION)
+    conteo_invalido &= ~codigo_invalido
+    if conteo_invalido.any():
+        reporte.agregar('error', 'poblacion', 'tipos',
+                        f"Se descartan {conteo_invalido.sum()} UPZ con conteos vacios, negativos o no enteros",
+                        codigos[conteo_invalido])
+
+    validas = ~(codigo_invalido | conteo_invalido)
+    obligatorias = ['CODIGO_UPZ'] + COLUMNAS_TEXTO + CONTEOS_POBLACION
+    limpia = df.loc[validas, [c for c in df.columns if c in obligatorias]].copy()
+    limpia['CODIGO_UPZ'] = codigos[validas].astype('int64')
+    limpia[CONTEOS_POBLACION] = conteos[validas].astype('int64')
+    limpia[COLUMNAS_TEXTO] = limpia[COLUMNAS_TEXTO].fillna('Sin datos').astype(str)
+
+    duplicados = limpia['CODIGO_UPZ'].duplicated()
+    if duplicados.any():
+        reporte.agregar('error', 'poblacion', 'duplicados',
+                        f"Se descartan {duplicados.sum()} filas con CODIGO_UPZ repetido",
+                        limpia.loc[duplicados, 'CODIGO_UPZ'].unique())
+        limpia = limpia[~duplicados]
+
+    # Consistencia entre conteos: se avisa pero la fila se conserva
+    grupos = [f'GRUPO_{g}' for g in GRUPOS]
+    distinto_total = limpia[grupos].sum(axis=1) != limpia['JOVENES_TOTAL']
+    if distinto_total.any():
+        reporte.agregar('aviso', 'poblacion', 'grupos_vs_total',
+                        f"En {distinto_total.sum()} UPZ la suma de GRUPO_A..D no coincide con JOVENES_TOTAL",
+                        limpia.loc[distinto_total, 'CODIGO_UPZ'])
+    for g in GRUPOS:
+        distinto_sexo = limpia[f'HOMBRES_{g}'] + limpia[f'MUJERES_{g}'] != limpia[f'GRUPO_{g}']
+        if distinto_sexo.any():
+            reporte.agregar('aviso', 'poblacion', f'sexo_vs_grupo_{g}',
+                            f"En {distinto_sexo.sum()} UPZ HOMBRES_{g} + MUJERES_{g} no coincide con GRUPO_{g}",
+                            limpia.loc[distinto_sexo, 'CODIGO_UPZ'])
+
+    return limpia.sort_values('CODIGO_UPZ').reset_index(drop=True)
+
+
+def validar_brechas(df_brechas, poblacion, reporte):
+    """
+    Valida brechas_por_upz.csv y la alinea con las UPZ de poblacion
+
+    BRECHA_ABSOLUTA puede ser negativa (mas beneficiarios que vulnerables) y
+    TASA_COBERTURA vacia o infinita cuando la UPZ no tiene vulnerables.
+
+    Returns:
+        DataFrame indexado por los CODIGO_UPZ de poblacion con las columnas de
+        brecha (NaN donde no hay dato valido), o None si el archivo no se puede usar
+    """
+    faltantes = [c for c in ['CODIGO_UPZ'] + COLUMNAS_BRECHAS if c not in df_brechas.columns]
+    if faltantes:
+        reporte.agregar('error', 'brechas', 'columnas',
+                        f"Se ignoran los datos de brechas; faltan columnas: {', '.join(faltantes)}")
+        return None
+
+    reporte.resumen['filas_brechas'] = len(df_brechas)
+    codigos_brechas, codigo_invalido = _codigos_validos(df_brechas['CODIGO_UPZ'])
+    beneficiarios, beneficiarios_invalidos = _conteos_validos(df_brechas, ['BENEFICIARIOS_RUTA_CORTA'])
+    brecha = pd.to_numeric(df_brechas['BRECHA_ABSOLUTA'], errors='coerce')
+    tasa = pd.to_numeric(df_brechas['TASA_COBERTURA'], errors='coerce')
+    invalidos = (
+        beneficiarios_invalidos
+        | brecha.isna() | (brecha != brecha.round())
+        | (tasa.isna() & df_brechas['TASA_COBERTURA'].notna())
+    ) & ~codigo_invalido
+    if codigo_invalido.any():
+        reporte.agregar('error', 'brechas', 'codigo',
+                        f"Se descartan {codigo_invalido.sum()} filas de brechas sin CODIGO_UPZ entero")
+    if invalidos.any():
+        reporte.agregar('error', 'brechas', 'tipos',
+                        f"Se descartan {invalidos.sum()} filas de brechas con valores vacios o no numericos",
+                        codigos_brechas[invalidos])
+
+    validas = ~(codigo_invalido | invalidos).to_numpy()
+    brechas = df_brechas[validas].copy()
+    brechas['BENEFICIARIOS_RUTA_CORTA'] = beneficiarios[validas].astype('int64')
+    brechas['BRECHA_ABSOLUTA'] = brecha[validas].astype('int64')
+    brechas['TASA_COBERTURA'] = tasa[validas]
+    brechas.index = codigos_brechas[validas].astype('int64').to_numpy()
+    brechas = brechas[~brechas.index.duplicated()].drop(columns='CODIGO_UPZ')
+
+    codigos = pd.Index(poblacion['CODIGO_UPZ'])
+    _cobertura(codigos, brechas.index, 'brechas', reporte)
+    brechas = brechas.reindex(codigos)
+
+    # Los conteos por grupo que trae el archivo de brechas deben ser los de poblacion
+    grupos = [c for c in [f'GRUPO_{g}' for g in GRUPOS] if c in brechas.columns]
+    con_dato = brechas['BENEFICIARIOS_RUTA_CORTA'].notna().to_numpy()
+    distintos = (brechas[grupos].to_numpy() != poblacion[grupos].to_numpy()).any(axis=1) & con_dato
+    if distintos.any():
+        reporte.agregar('aviso', 'brechas', 'grupos_vs_poblacion',
+                        f"En {distintos.sum()} UPZ los GRUPO_* de brechas no coinciden con los de poblacion",
+                        codigos[distintos])
+    return brechas
+
+
+def validar_geometria(codigos_fuente, geometria, fuente, codigos, reporte):
+    """
+    Alinea una fuente de geometria con las UPZ de poblacion y repara poligonos invalidos
+
+    Returns:
+        Arreglo de geometrias en el orden de codigos (None donde no hay)
+    """
+    codigos_fuente, codigo_invalido = _codigos_validos(pd.Series(codigos_fuente))
+    geometria = np.asarray(geometria, dtype=object)
+    validas = ~codigo_invalido.to_numpy() & ~shapely.is_missing(geometria)
+    serie = pd.Series(geometria[validas], index=codigos_fuente[validas].astype('int64').to_numpy())
+    serie = serie[~serie.index.duplicated()]
+
+    invalidas = ~shapely.is_valid(serie.to_numpy())
+    if invalidas.any():
+        reporte.agregar('aviso', fuente, 'geometria_invalida',
+                        f"Se repararon {invalidas.sum()} geometrias invalidas", serie.index[invalidas])
+        serie[invalidas] = shapely.make_valid(serie.to_numpy()[invalidas])
+
+    _cobertura(codigos, serie.index, fuente, reporte)
+    return serie.reindex(codigos).to_numpy()
+
+
+def _cobertura(codigos, codigos_fuente, fuente, reporte):
+    """Avisa de las UPZ de poblacion que faltan en una fuente y viceversa"""
+    sin_dato = codigos.difference(codigos_fuente)
+    sobrantes = pd.Index(codigos_fuente).difference(codigos)
+    reporte.resumen.setdefault('cobertura', {})[fuente] = {
+        'upz': int(len(codigos) - len(sin_dato)),
+        'faltantes': int(len(sin_dato)),
+        'sobrantes': int(len(sobrantes)),
+    }
+    if len(sin_dato):
+        reporte.agregar('aviso', fuente, 'cobertura',
+                        f"{len(sin_dato)} UPZ de poblacion no estan en {fuente}", sin_dato)
+    if len(sobrantes):
+        reporte.agregar('aviso', fuente, 'cobertura',
+                        f"{len(sobrantes)} codigos de {fuente} no estan en poblacion", sobrantes)
+
+
+# ============================================
+# TABLA DE HECHOS
+# ============================================
+def construir_tabla_hechos(df, df_brechas=None, gdf=None, geo_excel=None):
+    """
+    Valida las fuentes y las une en la tabla de hechos por UPZ
+
+    Cada UPZ queda en una posicion fija (indice entero denso IDX_UPZ, ordenado
+    por CODIGO_UPZ). La geometria sale del shapefile o, si no esta, del Excel
+    de geodatos; la cobertura se revisa en todas las fuentes recibidas.
+
+    Returns:
+        Tupla (GeoDataFrame de hechos en EPSG:4326, origen de la geometria o None, Reporte)
+
+    Raises:
+        ErrorValidacion: si la tabla de poblacion no se puede usar
+    """
+    reporte = Reporte()
+    hechos = validar_poblacion(df, reporte)
+    codigos = pd.Index(hechos['CODIGO_UPZ'])
+
+    if df_brechas is not None:
+        brechas = validar_brechas(df_brechas, hechos, reporte)
+        if brechas is not None:
+            # Solo se agregan las columnas que no estan ya en la tabla de poblacion
+            for col in brechas.columns.difference(hechos.columns, sort=False):
+                hechos[col] = brechas[col].to_numpy()
+
+    origen = None
+    geometria = np.full(len(hechos), None, dtype=object)
+    if geo_excel is not None:
+        geo_shape = geo_excel['geo_shape']
+        poligonos = shapely.from_geojson(geo_shape.where(geo_shape.notna(), None).to_numpy(), on_invalid='ignore')
+        geometria_excel = validar_geometria(geo_excel['CODIGO_UPZ'], poligonos, 'excel', codigos, reporte)
+        origen, geometria = 'excel', geometria_excel
+    if gdf is not None:
+        geometria_shape = validar_geometria(gdf['CODIGO_UPZ'], gdf.geometry.values, 'shapefile', codigos, reporte)
+        origen, geometria = 'shapefile', geometria_shape
+
+    hechos = gpd.GeoDataFrame(hechos, geometry=gpd.GeoSeries(geometria, crs='EPSG:4326'))
+    hechos.index.name = 'IDX_UPZ'
+    if origen is not None:
+        sin_geometria = hechos.loc[hechos.geometry.isna(), 'CODIGO_UPZ']
+        if len(sin_geometria):
+            reporte.agregar('aviso', origen, 'sin_geometria',
+                            f"{len(sin_geometria)} UPZ no tienen geometria valida y no se veran en los mapas",
+                            sin_geometria)
+
+    reporte.resumen['upz'] = len(hechos)
+    reporte.resumen['origen_geometria'] = origen
+    return hechos, origen, reporte
+
+
+# ============================================
+# ARTEFACTO
+# ============================================
+def guardar_artefacto(hechos, reporte, huellas):
+    """Escribe la tabla de hechos limpia (GeoParquet) y el reporte JSON con las huellas de las fuentes"""
+    hechos.to_parquet(ARTEFACTO, index=True)
+    contenido = {'fecha': datetime.now().isoformat(timespec='seconds'), 'fuentes': huellas}
+    contenido.update(reporte.a_dict())
+    with open(REPORTE, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=1)
+
+
+def cargar_artefacto():
+    """
+    Lee el artefacto si existe y fue compilado con las mismas fuentes que hay en disco
+
+    Returns:
+        Tupla (hechos, origen, dict del reporte) o None si hay que validar de nuevo
+    """
+    if not (os.path.exists(ARTEFACTO) and os.path.exists(REPORTE)):
+        return None
+    with open(REPORTE, encoding='utf-8') as f:
+        reporte = json.load(f)
+    if reporte.get('fuentes') != huella_fuentes():
+        return None
+    hechos = gpd.read_parquet(ARTEFACTO)
+    return hechos, reporte['resumen'].get('origen_geometria'), reporte
+
+
+def imprimir_reporte(reporte):
+    resumen = reporte['resumen']
+    print(f"UPZ en la tabla de hechos: {resumen.get('upz')} "
+          f"(poblacion: {resumen.get('filas_poblacion')} filas, "
+          f"geometria: {resumen.get('origen_geometria') or 'sin geometria'})")
+    for fuente, cobertura in resumen.get('cobertura', {}).items():
+        print(f"  {fuente:>10}: {cobertura['upz']} UPZ, {cobertura['faltantes']} faltantes, "
+              f"{cobertura['sobrantes']} sobrantes")
+    if not reporte['hallazgos']:
+        print("Sin hallazgos: todas las reglas se cumplen")
+    for hallazgo in reporte['hallazgos']:
+        codigos = ', '.join(str(c) for c in hallazgo['codigos'][:10])
+        if len(hallazgo['codigos']) > 10:
+            codigos += ', ...'
+        print(f"[{hallazgo['nivel'].upper()}] {hallazgo['fuente']}/{hallazgo['regla']}: {hallazgo['mensaje']}"
+              + (f" ({codigos})" if codigos else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida las fuentes y compila la tabla de hechos del tablero")
+    parser.add_argument('--solo-reporte', action='store_true',
+                        help="Imprime el reporte sin escribir el artefacto")
+    args = parser.parse_args()
+
+    huellas = huella_fuentes()
+    df = pd.read_excel(DATA_FILE)
+    df_brechas = pd.read_csv(BRECHAS_FILE) if os.path.exists(BRECHAS_FILE) else None
+    gdf = leer_shapefile() if os.path.exists(SHAPEFILE_PATH) else None
+    geo_excel = pd.read_excel(GEO_EXCEL) if os.path.exists(GEO_EXCEL) else None
+
+    try:
+        hechos, _, reporte = construir_tabla_hechos(df, df_brechas, gdf, geo_excel)
+    except ErrorValidacion as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+
+    imprimir_reporte(reporte.a_dict())
+    if not args.solo_reporte:
+        guardar_artefacto(hechos, reporte, huellas)
+        print(f"Artefacto: {ARTEFACTO}")
+        print(f"Reporte: {REPORTE}")
+
+
+if __name__ == '__main__':
+    main()